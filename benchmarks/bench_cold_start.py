@@ -0,0 +1,75 @@
+"""
+Cold start of a parsing process: time to load the models (det, rec, layout,
+tsr) and to get the first page through OCR, layout and table recognition,
+each run in a fresh process.
+
+Modes:
+    original    sessions built from the original .onnx files, graphs optimized on every load
+    first       optimized graphs written next to the models (the first process after a deploy)
+    cached      sessions built from the optimized graphs saved by an earlier process
+
+Usage:
+    python benchmarks/bench_cold_start.py --pdf document.pdf --repeat 3
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+MODES = ["original", "first", "cached"]
+
+
+def child(pdf, mode):
+    start = timer()
+    from ragflow.deepdoc.parser.pdf_parser import RAGFlowPdfParser
+    from ragflow.deepdoc.vision import OnnxSettings, SessionSettings
+
+    imported = timer()
+    s = SessionSettings(cache_optimized_model=mode != "original")
+    parser = RAGFlowPdfParser(onnx_settings=OnnxSettings(det=s, rec=s, layout=s, tsr=s))
+    loaded = timer()
+    parser.__images__(pdf, 3, 0, 1)
+    parser._layouts_rec(3)
+    parser._table_transformer_job(3)
+    done = timer()
+    print(json.dumps({"import": imported - start, "load": loaded - imported, "page": done - loaded, "total": done - start}))
+
+
+def remove_optimized_graphs():
+    from ragflow.api.utils.file_utils import get_project_base_directory
+    for path in glob.glob(os.path.join(get_project_base_directory(), "rag/res/deepdoc", "*.opt.onnx")):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=os.path.join(os.path.dirname(__file__), "..", "fixtures", "zhidu_travel.pdf"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=MODES)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.pdf, args.child)
+        return
+
+    print(f"{'mode':<10}{'import':>8}{'load':>8}{'page':>8}{'total':>8}")
+    for mode in MODES:
+        runs = []
+        for _ in range(args.repeat):
+            if mode == "first":
+                remove_optimized_graphs()
+            out = subprocess.run([sys.executable, __file__, "--pdf", args.pdf, "--child", mode],
+                                 check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        avg = {k: sum(r[k] for r in runs) / len(runs) for k in runs[0]}
+        print(f"{mode:<10}{avg['import']:>8.2f}{avg['load']:>8.2f}{avg['page']:>8.2f}{avg['total']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Text detection post-processing on dense synthetic probability maps: the
+per contour DBPostProcess followed by the per box filtering TextDetector used
+to do, against FastDBPostProcess and the batched `filter_tag_det_res`.
+tests/test_db_postprocess.py checks that both give the same boxes.
+
+Columns:
+    boxes       boxes per map
+    loop ms     ms per map, DBPostProcess and per box filtering
+    fast ms     ms per map, FastDBPostProcess and batched filtering
+
+Usage:
+    python benchmarks/bench_db_postprocess.py --lines 200,800,1600 --maps 10
+"""
+
+import argparse
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from ragflow.deepdoc.vision.ocr import TextDetector
+from ragflow.deepdoc.vision.postprocess import DBPostProcess, FastDBPostProcess
+
+PARAMS = {"thresh": 0.3, "box_thresh": 0.5, "max_candidates": 1000, "unclip_ratio": 1.5,
+          "use_dilation": False, "score_mode": "fast", "box_type": "quad"}
+# a zoomin=3 A4 page resized to the detector input
+SRC_H, SRC_W, H, W = 2526, 1786, 960, 704
+
+
+def probability_map(rng, lines, rotated=0.1):
+    """Text lines in rows and columns, a few of them rotated, over background noise below the threshold."""
+    pmap = np.zeros((H, W), np.float32)
+    cols = 8
+    step = max(8, (H - 16) // max(1, lines // cols))
+    for k in range(lines):
+        cy = 8 + (k // cols) * step + rng.uniform(-1, 1)
+        cx = (k % cols) * W / cols + W / cols / 2 + rng.uniform(-5, 5)
+        size = (rng.uniform(4, W / cols - 12), rng.uniform(3, max(4, step - 8)))
+        angle = rng.uniform(-30, 30) if rng.random() < rotated else 0
+        cv2.fillPoly(pmap, [cv2.boxPoints(((cx, cy), size, angle)).astype(np.int32)], float(rng.uniform(0.4, 1)))
+    pmap += rng.uniform(0, 0.25, pmap.shape).astype(np.float32)
+    return np.clip(pmap, 0, 1)[None, None]
+
+
+def filter_loop(det, dt_boxes):
+    boxes = []
+    for box in dt_boxes:
+        box = det.clip_det_res(det.order_points_clockwise(box), SRC_H, SRC_W)
+        if int(np.linalg.norm(box[0] - box[1])) <= 3 or int(np.linalg.norm(box[0] - box[3])) <= 3:
+            continue
+        boxes.append(box)
+    return np.array(boxes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", default="200,800,1600")
+    parser.add_argument("--maps", type=int, default=10)
+    args = parser.parse_args()
+
+    # only the filtering methods are used, no model is needed
+    det = TextDetector.__new__(TextDetector)
+    loop, fast = DBPostProcess(**PARAMS), FastDBPostProcess(**PARAMS)
+    shape = [np.array([SRC_H, SRC_W, H / SRC_H, W / SRC_W])]
+    rng = np.random.default_rng(0)
+
+    print(f"{'lines':<8}{'boxes':>8}{'loop ms':>10}{'fast ms':>10}")
+    for lines in [int(n) for n in args.lines.split(",")]:
+        maps = [probability_map(rng, lines) for _ in range(args.maps)]
+        t_loop, t_fast, n = 0, 0, 0
+        for pmap in maps:
+            start = timer()
+            filter_loop(det, loop({"maps": pmap}, shape)[0]["points"])
+            t_loop += timer() - start
+            start = timer()
+            res = det.filter_tag_det_res(fast({"maps": pmap}, shape)[0]["points"], (SRC_H, SRC_W))
+            t_fast += timer() - start
+            n += len(res)
+        print(f"{lines:<8}{n / len(maps):>8.0f}{t_loop * 1000 / len(maps):>10.1f}{t_fast * 1000 / len(maps):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
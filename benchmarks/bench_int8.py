@@ -0,0 +1,121 @@
+"""
+Speed and agreement of the int8 model variants against fp32 on local PDFs,
+through OCR, layout and table structure recognition.
+
+Variants:
+    fp32        every model in fp32, the reference
+    int8        every model in int8
+    det, rec, layout, tsr
+                only that model in int8
+
+Columns:
+    pages/s     pages per second through the three stages
+    text        mean per page similarity (difflib ratio) of the OCR text to fp32
+    det         F1 of the OCR boxes against fp32, matched at IoU >= 0.5
+    layout      F1 of the page layouts against fp32, same type and IoU >= 0.5
+    tsr         F1 of the table components against fp32, same label and IoU >= 0.5
+
+Make the int8 models first:
+    python -m ragflow.deepdoc.vision.quantize --mode static --calibration fixtures/*.pdf
+
+Usage:
+    python benchmarks/bench_int8.py --pdf fixtures/*.pdf --variants fp32,int8,det,rec,layout,tsr
+"""
+
+import argparse
+import glob
+import os
+import sys
+from difflib import SequenceMatcher
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from ragflow.deepdoc.parser.pdf_parser import RAGFlowPdfParser
+from ragflow.deepdoc.vision import OnnxSettings
+from ragflow.deepdoc.vision.session_settings import MODELS
+
+
+def settings_of(variant):
+    if variant == "fp32":
+        return OnnxSettings()
+    if variant == "int8":
+        return OnnxSettings().with_precision("int8")
+    return OnnxSettings().with_precision("int8", [variant])
+
+
+def run(parser, pdf, pages):
+    parser.__images__(pdf, 3, 0, pages)
+    ocr = [[{k: b[k] for k in ("x0", "x1", "top", "bottom", "text")} for b in bxs] for bxs in parser.boxes]
+    parser._layouts_rec(3)
+    parser._table_transformer_job(3)
+    layouts = [[(lt["type"], lt) for lt in lts] for lts in parser.page_layout]
+    tables = [[(c["label"], c) for c in parser.tb_cpns if c["pn"] == pn] for pn in range(len(parser.page_images))]
+    return len(parser.page_images), ocr, layouts, tables
+
+
+def iou(a, b):
+    w = min(a["x1"], b["x1"]) - max(a["x0"], b["x0"])
+    h = min(a["bottom"], b["bottom"]) - max(a["top"], b["top"])
+    if w <= 0 or h <= 0:
+        return 0.
+    inter = w * h
+    return inter / ((a["x1"] - a["x0"]) * (a["bottom"] - a["top"]) + (b["x1"] - b["x0"]) * (b["bottom"] - b["top"]) - inter)
+
+
+def f1(ref, got):
+    """Greedy matching of (label, box) pairs with the same label and IoU >= 0.5."""
+    if not ref and not got:
+        return 1.
+    used, hit = set(), 0
+    for label, r in ref:
+        for j, (lb, g) in enumerate(got):
+            if j not in used and lb == label and iou(r, g) >= 0.5:
+                used.add(j)
+                hit += 1
+                break
+    return 2. * hit / (len(ref) + len(got))
+
+
+def page_text(bxs):
+    return "\n".join(b["text"] for b in sorted(bxs, key=lambda b: (b["top"], b["x0"])))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", nargs="*", default=glob.glob(os.path.join(os.path.dirname(__file__), "..", "fixtures", "*.pdf")))
+    parser.add_argument("--pages", type=int, default=299)
+    parser.add_argument("--variants", default="fp32,int8," + ",".join(MODELS))
+    args = parser.parse_args()
+
+    variants = args.variants.split(",")
+    if variants[0] != "fp32":
+        variants.insert(0, "fp32")
+    ref = None
+    print(f"{'variant':<8}{'pages/s':>9}{'text':>8}{'det':>8}{'layout':>8}{'tsr':>8}")
+    for variant in variants:
+        pdf_parser = RAGFlowPdfParser(onnx_settings=settings_of(variant))
+        run(pdf_parser, args.pdf[0], 1)  # warm up
+
+        results, pages, start = [], 0, timer()
+        for pdf in args.pdf:
+            res = run(pdf_parser, pdf, args.pages)
+            pages += res[0]
+            results.append(res[1:])
+        pps = pages / (timer() - start)
+        ref = ref or results
+
+        text, det, layout, tsr = [], [], [], []
+        for (r_ocr, r_lay, r_tsr), (ocr, lay, tsr_) in zip(ref, results):
+            for pn in range(len(r_ocr)):
+                text.append(SequenceMatcher(None, page_text(r_ocr[pn]), page_text(ocr[pn])).ratio())
+                det.append(f1([("", b) for b in r_ocr[pn]], [("", b) for b in ocr[pn]]))
+                layout.append(f1(r_lay[pn], lay[pn]))
+                tsr.append(f1(r_tsr[pn], tsr_[pn]))
+        print(f"{variant:<8}{pps:>9.2f}{np.mean(text):>8.3f}{np.mean(det):>8.3f}{np.mean(layout):>8.3f}{np.mean(tsr):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Pages per second of the OCR stage of RAGFlowPdfParser.__images__ on a CPU
+host, OCRing pages one after another in this process (0 workers) and with an
+OcrPool of increasing size.
+
+The speedup column is relative to 0 workers; the pool workers are started and
+their models loaded before timing. Since every ONNX session already runs 2
+intra-op threads, scaling should stay near linear up to about cpu_count / 2
+workers.
+
+Usage:
+    python benchmarks/bench_ocr_processes.py --pdf document.pdf --processes 0,1,2,4,8,16 --settings many-workers
+"""
+
+import argparse
+import os
+import sys
+import time
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ragflow.deepdoc.parser.ocr_pool import get_ocr_pool
+from ragflow.deepdoc.parser.pdf_parser import RAGFlowPdfParser
+from ragflow.deepdoc.vision import OnnxSettings
+
+SETTINGS = {
+    "default": OnnxSettings,
+    "single-process": OnnxSettings.single_process,
+    "many-workers": OnnxSettings.many_workers,
+}
+
+
+def ocr_document(parser, fnm, zoomin, pages, processes):
+    parser.__images__(fnm, zoomin, 0, pages, ocr_processes=processes)
+    return len(parser.page_images), sum(len(b) for b in parser.boxes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=os.path.join(os.path.dirname(__file__), "..", "fixtures", "zhidu_travel.pdf"))
+    parser.add_argument("--zoomin", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=299)
+    parser.add_argument("--processes", default="0,1,2,4,8")
+    parser.add_argument("--settings", choices=list(SETTINGS.keys()), default="default")
+    args = parser.parse_args()
+
+    onnx_settings = SETTINGS[args.settings]()
+    pdf_parser = RAGFlowPdfParser(ocr_only=True, onnx_settings=onnx_settings)
+    base = None
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'workers':>8}{'pages':>7}{'boxes':>7}{'pages/s':>10}{'speedup':>9}")
+    for processes in [int(n) for n in args.processes.split(",")]:
+        if processes:
+            # spawn all the workers and load their models, busy ones make the pool start the next
+            list(get_ocr_pool(processes, onnx_settings).executor.map(time.sleep, [0.5] * processes))
+        start = timer()
+        pages, boxes = ocr_document(pdf_parser, args.pdf, args.zoomin, args.pages, processes)
+        pps = pages / (timer() - start)
+        base = base or pps
+        print(f"{processes:>8}{pages:>7}{boxes:>7}{pps:>10.2f}{pps / base:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
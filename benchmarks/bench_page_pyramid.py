@@ -0,0 +1,71 @@
+"""
+Preprocessing cost of text detection and layout recognition per page, fed
+with the full page images (zoomin=3) or with their levels of the page pyramid
+(page_pyramid=True), and the whole pass of both models.
+
+Columns:
+    det pre     ms per page in the detector preprocessing (resize, normalize)
+    lay pre     ms per page in the layout preprocessing (letterbox, normalize)
+    peak MB     peak memory allocated by numpy during both preprocessings of a page
+    pages/s     pages per second through detection and layout recognition
+
+Usage:
+    python benchmarks/bench_page_pyramid.py --pdf document.pdf --pages 16
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from ragflow.deepdoc.parser.pdf_parser import RAGFlowPdfParser
+from ragflow.deepdoc.vision.ocr import transform
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=os.path.join(os.path.dirname(__file__), "..", "fixtures", "zhidu_travel.pdf"))
+    parser.add_argument("--pages", type=int, default=16)
+    args = parser.parse_args()
+
+    pdf_parser = RAGFlowPdfParser()
+    pdf_parser.__images__(args.pdf, 3, 0, args.pages)
+    det = pdf_parser.ocr.text_detector[0]
+    pns = list(range(len(pdf_parser.page_images)))
+
+    print(f"{'images':<10}{'det pre':>9}{'lay pre':>9}{'peak MB':>9}{'pages/s':>9}")
+    for pyramid in [False, True]:
+        pdf_parser.page_pyramid = pyramid
+        pdf_parser.page_levels.clear()
+        det_t, lay_t, peak = 0, 0, 0
+        for pn in pns:
+            det_img = pdf_parser._page_level(pn, det.input_side())[0] if pyramid else pdf_parser.page_images[pn]
+            lay_img = pdf_parser._page_level(pn, pdf_parser.layouter.input_side())[0] if pyramid else pdf_parser.page_images[pn]
+            tracemalloc.start()
+            start = timer()
+            transform({"image": np.array(det_img)}, det.preprocess_op)
+            det_t += timer() - start
+            start = timer()
+            pdf_parser.layouter.preprocess([np.array(lay_img)])
+            lay_t += timer() - start
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        pdf_parser.page_levels.clear()
+        start = timer()
+        for pn in pns:
+            img = pdf_parser._page_level(pn, det.input_side())[0] if pyramid else pdf_parser.page_images[pn]
+            pdf_parser.ocr.detect(np.array(img))
+        pdf_parser._predict_layouts(pns)
+        pps = len(pns) / (timer() - start)
+        print(f"{'pyramid' if pyramid else 'full':<10}{det_t * 1000 / len(pns):>9.1f}{lay_t * 1000 / len(pns):>9.1f}"
+              f"{peak / (1 << 20):>9.1f}{pps:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Throughput of the page loading stage of RAGFlowPdfParser.__images__
+(rasterization + char extraction) when several documents are loaded from
+several threads at once.
+
+Modes:
+    locked      the whole stage under the process wide pdfplumber lock (as before)
+    in-process  pdfium renders serialized by the lock, text extraction concurrent
+    pool        renders in a RasterizerPool, text extraction concurrent
+
+Only the page loading is timed, no models are needed. Concurrent text
+extraction can only scale with as many cores as threads: on a single core
+every mode stays flat, the pool one below the others from shipping the page
+images between processes.
+
+Usage:
+    python benchmarks/bench_rasterize_threads.py --docs 16 --threads 1,2,4,8
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pdfplumber
+
+from ragflow.deepdoc.parser.rasterizer import LOCK_KEY_pdfplumber, get_rasterizer, get_rasterizer_pool
+
+
+def load_pages(fnm, zoomin, mode, processes, rasterizer):
+    with pdfplumber.open(fnm) as pdf:
+        if mode == "pool":
+            images = get_rasterizer_pool(processes).render(fnm, zoomin, range(len(pdf.pages)), rasterizer)
+        else:
+            with get_rasterizer(rasterizer, fnm) as r:
+                images = [r.render(i, zoomin) for i in range(len(pdf.pages))]
+        chars = [page.dedupe_chars().chars for page in pdf.pages]
+    return len(images), sum(len(c) for c in chars)
+
+
+def load_pages_locked(fnm, zoomin, processes):
+    with sys.modules[LOCK_KEY_pdfplumber]:
+        with pdfplumber.open(fnm) as pdf:
+            images = [p.to_image(resolution=72 * zoomin, antialias=True).annotated for p in pdf.pages]
+            chars = [page.dedupe_chars().chars for page in pdf.pages]
+    return len(images), sum(len(c) for c in chars)
+
+
+def run(fnm, docs, threads, zoomin, mode, processes, rasterizer="pdfplumber"):
+    def job(_):
+        if mode == "locked":
+            return load_pages_locked(fnm, zoomin, processes)
+        return load_pages(fnm, zoomin, mode, processes, rasterizer)
+
+    start = timer()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pages = sum(n for n, _ in executor.map(job, range(docs)))
+    return pages / (timer() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=os.path.join(os.path.dirname(__file__), "..", "fixtures", "zhidu_travel.pdf"))
+    parser.add_argument("--docs", type=int, default=16)
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--zoomin", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--modes", default="locked,in-process,pool")
+    parser.add_argument("--rasterizer", default="pdfplumber", help="backend of the in-process and pool modes")
+    args = parser.parse_args()
+
+    # spawn the pool and read the file once before timing
+    run(args.pdf, 1, 1, args.zoomin, "pool", args.processes, args.rasterizer)
+    with open(args.pdf, "rb") as f:
+        f.read()
+
+    print(f"{'mode':<12}{'threads':>8}{'pages/s':>10}")
+    for mode in args.modes.split(","):
+        for threads in [int(t) for t in args.threads.split(",")]:
+            pps = run(args.pdf, args.docs, threads, args.zoomin, mode, args.processes, args.rasterizer)
+            print(f"{mode:<12}{threads:>8}{pps:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Pages per second of each rasterizer backend, and how close their page images
+are to the pdfplumber ones the models were tuned on.
+
+Parity columns, per page against pdfplumber:
+    size     largest width/height difference in pixels
+    mad      mean absolute pixel difference (0-255) over the common area
+    >32      share of pixels differing by more than 32 in some channel
+
+Usage:
+    python benchmarks/bench_rasterizers.py --pdf document.pdf --zoomin 3 --repeat 3
+"""
+
+import argparse
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from ragflow.deepdoc.parser.rasterizer import RASTERIZERS, as_array, as_pil_image, get_rasterizer
+
+
+def render_all(name, fnm, zoomin):
+    # as the parser gets them
+    with get_rasterizer(name, fnm) as r:
+        return [as_pil_image(r.render(i, zoomin)) for i in range(len(r))]
+
+
+def parity(ref, img):
+    ref, img = as_array(ref), as_array(img)
+    h, w = min(ref.shape[0], img.shape[0]), min(ref.shape[1], img.shape[1])
+    diff = np.abs(ref[:h, :w].astype(np.int16) - img[:h, :w].astype(np.int16))
+    size = max(abs(ref.shape[0] - img.shape[0]), abs(ref.shape[1] - img.shape[1]))
+    return size, float(diff.mean()), float((diff.max(axis=2) > 32).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=os.path.join(os.path.dirname(__file__), "..", "fixtures", "zhidu_travel.pdf"))
+    parser.add_argument("--zoomin", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        binary = f.read()
+
+    images = {}
+    print(f"{'rasterizer':<12}{'pages/s':>10}{'size':>6}{'mad':>8}{'>32':>8}")
+    for name in RASTERIZERS:
+        render_all(name, binary, args.zoomin)
+        start = timer()
+        for _ in range(args.repeat):
+            images[name] = render_all(name, binary, args.zoomin)
+        pps = len(images[name]) * args.repeat / (timer() - start)
+
+        stats = [parity(ref, img) for ref, img in zip(images["pdfplumber"], images[name])]
+        size = max(s for s, _, _ in stats)
+        mad = np.mean([m for _, m, _ in stats])
+        far = np.mean([p for _, _, p in stats])
+        print(f"{name:<12}{pps:>10.2f}{size:>6}{mad:>8.3f}{far:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Text recognition of the crops of OCRed pages, batched by width within the
+pixel budget (SessionSettings.max_batch_pixels) against fixed batches of 16.
+
+Columns:
+    crops       text crops recognized
+    batches     recognizer runs
+    padded Mpx  input pixels per channel fed to the recognizer, padding included
+    fill        share of those pixels covered by the crops themselves
+    s           recognition time
+    same        share of crops given the same text as with fixed batches
+
+Usage:
+    python benchmarks/bench_rec_batching.py --pdf document.pdf --pages 8 --budgets 0,491520,983040
+"""
+
+import argparse
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from ragflow.deepdoc.parser.rasterizer import as_array, get_rasterizer
+from ragflow.deepdoc.vision import OCR
+
+
+def crops_of(ocr, pdf, pages, zoomin=3):
+    crops = []
+    with get_rasterizer("pdfplumber", pdf) as r:
+        for i in range(min(len(r), pages)):
+            img = as_array(r.render(i, zoomin))
+            dt_boxes, _ = ocr.text_detector[0](img)
+            for box in (dt_boxes if dt_boxes is not None else []):
+                crops.append(ocr.get_rotate_crop_image(img, box, orient=False))
+    return crops
+
+
+def padding_stats(rec, crops):
+    """Batches, padded pixels and the share of them covered by crops, as `rec` batches `crops`."""
+    ratios = sorted(c.shape[1] / c.shape[0] for c in crops)
+    _, imgH, imgW = rec.rec_image_shape[:3]
+    bounds = rec.batch_bounds(ratios)
+    padded, covered = 0, 0
+    for beg, end in bounds:
+        width = rec.padded_width(max([imgW / imgH] + ratios[beg:end]))
+        padded += (end - beg) * imgH * width
+        covered += sum(min(width, np.ceil(imgH * r)) * imgH for r in ratios[beg:end])
+    return len(bounds), padded, covered / max(1, padded)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default=os.path.join(os.path.dirname(__file__), "..", "fixtures", "zhidu_travel.pdf"))
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--budgets", default="0,491520,983040")
+    args = parser.parse_args()
+
+    ocr = OCR()
+    rec = ocr.text_recognizer[0]
+    crops = crops_of(ocr, args.pdf, args.pages)
+    ref = None
+
+    print(f"{'budget':<10}{'crops':>8}{'batches':>9}{'padded Mpx':>12}{'fill':>7}{'s':>8}{'same':>7}")
+    for budget in [int(b) for b in args.budgets.split(",")]:
+        rec.max_batch_pixels = budget
+        rec(crops[:16])  # warm up
+        start = timer()
+        res, _ = rec(crops)
+        elapsed = timer() - start
+        ref = ref if ref is not None else [t for t, _ in res]
+        same = np.mean([t == r for (t, _), r in zip(res, ref)]) if res else 1.
+        batches, padded, fill = padding_stats(rec, crops)
+        print(f"{budget:<10}{len(crops):>8}{batches:>9}{padded / 1e6:>12.1f}{fill:>7.2f}{elapsed:>8.2f}{same:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,9 @@ Original RAGFlow Repository: https://github.com/infiniflow/ragflow
 """
 
 from .parser import PdfParser
+from .cache import ParseCache
 from .parse_types import ChunkResult, ParseResult, TableResult
-from .utils import parse_pdf, extract_text, extract_text_by_page, extract_tables, parse_pdf_binary
+from .utils import parse_pdf, extract_text, extract_text_by_page, extract_tables, parse_pdf_binary, get_default_parser
 
 __version__ = "0.1.4"
 __author__ = "Extracted from RAGFlow DeepDoc"
@@ -17,6 +18,7 @@ __license__ = "Apache-2.0"
 
 __all__ = [
     "PdfParser", 
+    "ParseCache",
     "ChunkResult", 
     "ParseResult",
     "TableResult",
@@ -24,5 +26,6 @@ __all__ = [
     "extract_text",
     "extract_text_by_page", 
     "extract_tables",
-    "parse_pdf_binary"
+    "parse_pdf_binary",
+    "get_default_parser"
 ] 
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+解析结果的磁盘缓存
+
+以PDF内容的哈希和解析参数作为键，缓存完整的ParseResult，
+多个进程可以共用同一个缓存目录
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from typing import Any, Optional
+
+from .parse_types import ParseResult
+
+# 缓存内容的格式版本，ParseResult结构变化时递增，使旧缓存失效
+CACHE_FORMAT = 1
+CACHE_SUFFIX = ".pkl"
+
+
+class ParseCache:
+    """
+    基于内容哈希的解析结果缓存
+
+    - 写入先落到同目录的临时文件，再用os.replace原子替换，读者不会看到半写的文件
+    - 命中时更新文件的修改时间，超出容量时按修改时间从旧到新淘汰（LRU）
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        """
+        Args:
+            cache_dir: 缓存目录，不存在时自动创建
+            max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(pdf_binary: bytes, **options: Any) -> str:
+        """
+        计算缓存键
+
+        Args:
+            pdf_binary: PDF二进制数据
+            **options: 影响解析结果的参数（页码范围、缩放、解析选项等）
+
+        Returns:
+            str: 十六进制的sha256
+        """
+        h = hashlib.sha256(pdf_binary)
+        h.update(json.dumps({"format": CACHE_FORMAT, **options}, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[ParseResult]:
+        """读取缓存，未命中或文件损坏时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"读取解析缓存失败，已丢弃: {path}: {e}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: ParseResult) -> None:
+        """写入缓存，并在超出容量时淘汰最久未使用的条目"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """按修改时间淘汰缓存，直到总大小不超过上限"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # 被其他进程淘汰了
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self) -> None:
+        """清空缓存"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -5,19 +5,30 @@ PDF解析器主模块
 """
 
 import os
+import re
+import inspect
 import logging
-from typing import Optional, Callable
+import threading
+from typing import Any, List, Optional, Callable
 
 try:
     from ragflow.rag.app.manual import Pdf as RagflowPdf, chunk as ragflow_chunk
     from ragflow.rag.nlp import rag_tokenizer
     from ragflow.rag.utils import num_tokens_from_string
     from ragflow.api.db import ParserType
+    from ragflow.deepdoc.vision import OnnxSettings
 except ImportError as e:
     logging.warning(f"无法导入ragflow模块: {e}")
     logging.warning("请确保ragflow模块在正确的路径下")
 
-from parse_types import ChunkResult, ParseResult, TableResult
+from .cache import ParseCache
+from .parse_types import ChunkResult, ParseResult, TableResult
+
+# 只影响解析速度、内存或断点续传，不改变解析结果的参数，不参与缓存键
+_NON_RESULT_OPTIONS = frozenset([
+    "callback", "onnx_settings", "checkpoint_dir", "page_window", "ocr_snapshot", "rec_queue_size",
+    "ocr_processes", "raster_processes", "pipeline_queue_size", "rasterizer",
+])
 
 
 class PdfParser:
@@ -29,28 +40,86 @@ class PdfParser:
     - 布局分析
     - 表格提取
     - 智能分块
+    
+    模型（OCR、布局识别、表格结构识别、XGBoost）按会话设置（OnnxSettings）分别加载，
+    在第一次用到该设置的实际解析时加载一次，之后使用同一设置的调用共用，命中缓存时不加载模型，
+    建议长期持有同一个实例。
+    每次解析使用独立的文档上下文，同一实例可在多个线程中并发解析。
     """
     
-    def __init__(self, model_type: str = "manual"):
+    def __init__(self, model_type: str = "manual", cache_dir: Optional[str] = None,
+                 cache_max_bytes: int = 1 << 30, onnx_settings: Any = None):
         """
         初始化PDF解析器
         
         Args:
             model_type: 模型类型，默认为"manual"
+            cache_dir: 解析结果缓存目录，为None时不使用缓存
+            cache_max_bytes: 缓存总大小上限（字节），超出时淘汰最久未使用的结果
+            onnx_settings: 各模型的ONNX Runtime会话设置（OnnxSettings），为None时使用默认设置，
+                单进程部署可用OnnxSettings.single_process()，多worker部署可用OnnxSettings.many_workers()；
+                单次解析也可以通过onnx_settings参数另行指定，例如使用int8模型
         """
         self.model_type = model_type
-        self._parser = None
-        self._init_parser()
+        self.onnx_settings = onnx_settings
+        # 每种会话设置（如fp32、int8模型）一套模型，按需加载
+        self._parsers = {}
+        self._parser_lock = threading.Lock()
+        self._cache = ParseCache(cache_dir, cache_max_bytes) if cache_dir else None
     
-    def _init_parser(self):
+    def _init_parser(self, onnx_settings: Any = None):
         """初始化内部解析器"""
         try:
-            self._parser = RagflowPdf()
-            self._parser.model_speciess = ParserType.MANUAL.value
+            parser = RagflowPdf(onnx_settings=onnx_settings)
+            parser.model_speciess = ParserType.MANUAL.value
+            return parser
         except Exception as e:
             logging.error(f"初始化PDF解析器失败: {e}")
             raise RuntimeError(f"无法初始化PDF解析器: {e}")
     
+    def _get_parser(self, onnx_settings: Any = None):
+        """获取使用该会话设置的内部解析器，首次调用时加载模型"""
+        onnx_settings = onnx_settings or self.onnx_settings
+        if onnx_settings not in self._parsers:
+            with self._parser_lock:
+                if onnx_settings not in self._parsers:
+                    self._parsers[onnx_settings] = self._init_parser(onnx_settings)
+        return self._parsers[onnx_settings]
+    
+    def _chunk(self, **kwargs) -> list:
+        """使用已加载的模型调用ragflow的chunk函数，每个文档在独立的上下文中解析"""
+        return ragflow_chunk(pdf_parser=self._get_parser(kwargs.pop("onnx_settings", None)), **kwargs)
+    
+    def _cache_key(self, pdf_binary: bytes, method: str, **options: Any) -> str:
+        """由PDF内容和影响结果的参数计算缓存键，不影响结果的参数不参与（见_NON_RESULT_OPTIONS），会话设置中只有影响结果的设置参与（见OnnxSettings.result_settings）"""
+        onnx_settings = options.get("onnx_settings") or self.onnx_settings or OnnxSettings()
+        options = {k: v for k, v in options.items() if k not in _NON_RESULT_OPTIONS}
+        options.update(onnx_settings.result_settings())
+        return ParseCache.make_key(pdf_binary, method=method, model_type=self.model_type, **options)
+    
+    @staticmethod
+    def _rename_cached(result: ParseResult, filename: str) -> None:
+        """缓存键不含文件名，命中时按本次的文件名更新文档名相关字段"""
+        title_tks = None
+        for chunk in result.chunks:
+            raw = chunk.raw_data
+            if not raw or raw.get("docnm_kwd", filename) == filename:
+                continue
+            if title_tks is None:
+                title_tks = rag_tokenizer.tokenize(re.sub(r"\.[a-zA-Z]+$", "", filename))
+            raw["docnm_kwd"] = filename
+            raw["title_tks"] = title_tks
+            raw["title_sm_tks"] = rag_tokenizer.fine_grained_tokenize(title_tks)
+    
+    def _cache_put(self, key: Optional[str], result: ParseResult) -> None:
+        """写入缓存，写入失败不影响解析结果"""
+        if key is None:
+            return
+        try:
+            self._cache.put(key, result)
+        except Exception as e:
+            logging.warning(f"写入解析缓存失败: {e}")
+    
     def _process_results(self, results: list, file_identifier: str) -> ParseResult:
         """
         处理ragflow的解析结果，转换为标准格式
@@ -145,10 +214,25 @@ class PdfParser:
         
         if callback is None:
             callback = self._default_callback
+        
+        # 命中缓存时直接返回，不加载模型
+        cache_key = None
+        if self._cache:
+            with open(pdf_path, "rb") as f:
+                cache_key = self._cache_key(f.read(), "parse", from_page=from_page, to_page=to_page, **kwargs)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._rename_cached(cached, pdf_path)
+                cached.metadata.update({
+                    'file_identifier': pdf_path,
+                    'file_path': pdf_path,
+                    'from_cache': True,
+                })
+                return cached
             
         try:
             # 使用ragflow的chunk函数进行解析
-            results = ragflow_chunk(
+            results = self._chunk(
                 filename=pdf_path,
                 from_page=from_page,
                 to_page=to_page,
@@ -170,8 +254,10 @@ class PdfParser:
                 'total_pages': actual_pages,
                 'parsed_page_range': f"{from_page}-{min(to_page, actual_pages)}",
                 'file_path': pdf_path,
+                'from_cache': False,
             })
             
+            self._cache_put(cache_key, parse_result)
             return parse_result
             
         except Exception as e:
@@ -193,9 +279,26 @@ class PdfParser:
         Returns:
             ParseResult: 解析结果
         """
+        if kwargs.get("callback") is None:
+            kwargs["callback"] = self._default_callback
+        
+        # 命中缓存时直接返回，不加载模型
+        cache_key = None
+        if self._cache:
+            cache_key = self._cache_key(pdf_binary, "parse_binary", **kwargs)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._rename_cached(cached, filename)
+                cached.metadata.update({
+                    'file_identifier': filename,
+                    'file_name': filename,
+                    'from_cache': True,
+                })
+                return cached
+            
         try:
             # 使用ragflow的chunk函数进行解析
-            results = ragflow_chunk(
+            results = self._chunk(
                 filename=filename,
                 binary=pdf_binary,
                 **kwargs
@@ -207,14 +310,75 @@ class PdfParser:
             # 添加文件名相关的元数据
             parse_result.metadata.update({
                 'file_name': filename,
+                'from_cache': False,
             })
             
+            self._cache_put(cache_key, parse_result)
             return parse_result
             
         except Exception as e:
             logging.error(f"解析PDF二进制数据失败: {e}")
             raise RuntimeError(f"解析PDF二进制数据失败: {e}")
     
+    def extract_tables(self,
+                       pdf_path: str,
+                       from_page: int = 0,
+                       to_page: int = 100000,
+                       callback: Optional[Callable[[Optional[float], str], None]] = None,
+                       **kwargs) -> List[TableResult]:
+        """
+        只提取PDF中的表格
+        
+        先做布局识别，只对表格区域（含表格标题）做OCR和表格结构识别，
+        表格以外的文字不识别，也不做分块，比parse快得多，适合只需要表格的场景
+        
+        Args:
+            pdf_path: PDF文件路径
+            from_page: 起始页码（从0开始）
+            to_page: 结束页码
+            callback: 进度回调函数
+            **kwargs: 其他参数，如onnx_settings、layout_scale（布局识别前页面图像的缩放比例），
+                page_window、rasterizer；只适用于parse的参数（如lang、parser_config）被忽略
+            
+        Returns:
+            List[TableResult]: 表格列表，位置和页码与parse的结果一致
+        """
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF文件不存在: {pdf_path}")
+        
+        if callback is None:
+            callback = self._default_callback
+        
+        try:
+            parser = self._get_parser(kwargs.pop("onnx_settings", None)).fork()
+            # parse的参数（如lang、parser_config、text_layer）对只提取表格不适用，忽略
+            accepted = inspect.signature(parser.extract_tables).parameters
+            ignored = sorted(k for k in kwargs if k not in accepted)
+            if ignored:
+                logging.info(f"提取表格时忽略参数: {ignored}")
+            kwargs = {k: v for k, v in kwargs.items() if k in accepted}
+            try:
+                tbls = parser.extract_tables(pdf_path, page_from=from_page, page_to=to_page, callback=callback, **kwargs)
+            finally:
+                # 表格图像已经裁剪好，释放页面图像和PDF句柄
+                parser.close()
+        except Exception as e:
+            logging.error(f"提取PDF表格失败: {e}")
+            raise RuntimeError(f"提取PDF表格失败: {e}")
+        
+        tables = []
+        for (_, rows), poss in tbls:
+            if not rows:
+                continue
+            # 与position_int一致: (x0, x1, top, bottom)，页码从1开始
+            pn, left, right, top, bottom = poss[0]
+            tables.append(TableResult(
+                html=rows,
+                position=(int(left), int(right), int(top), int(bottom)),
+                page_number=int(pn + 1)
+            ))
+        return tables
+    
     @staticmethod
     def _default_callback(progress: Optional[float] = None, message: str = "", msg: str = "", prog: Optional[float] = None):
         """默认回调函数"""
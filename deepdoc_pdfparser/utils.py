@@ -4,11 +4,31 @@
 提供简单易用的PDF解析API
 """
 
+import threading
 from typing import List, Optional, Callable
 from .parser import PdfParser
 from .parse_types import ParseResult
 
 
+_default_parser: Optional[PdfParser] = None
+_default_parser_lock = threading.Lock()
+
+
+def get_default_parser() -> PdfParser:
+    """
+    获取共享的默认解析器，首次调用时加载模型
+    
+    Returns:
+        PdfParser: 进程内共享的解析器实例
+    """
+    global _default_parser
+    if _default_parser is None:
+        with _default_parser_lock:
+            if _default_parser is None:
+                _default_parser = PdfParser()
+    return _default_parser
+
+
 def parse_pdf(pdf_path: str, 
               from_page: int = 0, 
               to_page: int = 100000,
@@ -33,8 +53,7 @@ def parse_pdf(pdf_path: str,
         >>> for chunk in result:
         ...     print(chunk.content)
     """
-    parser = PdfParser()
-    return parser.parse(pdf_path, from_page, to_page, callback, **kwargs)
+    return get_default_parser().parse(pdf_path, from_page, to_page, callback, **kwargs)
 
 
 def extract_text(pdf_path: str, **kwargs) -> str:
@@ -72,15 +91,16 @@ def extract_tables(pdf_path: str, **kwargs) -> List[str]:
     """
     提取PDF中的所有表格（HTML格式）
     
+    只对表格区域做OCR，见PdfParser.extract_tables
+    
     Args:
         pdf_path: PDF文件路径
-        **kwargs: 其他参数
+        **kwargs: 其他参数，只适用于parse的参数（如lang、parser_config）被忽略
         
     Returns:
         List[str]: 表格的HTML列表
     """
-    result = parse_pdf(pdf_path, **kwargs)
-    return [table.html for table in result.tables]
+    return [table.html for table in get_default_parser().extract_tables(pdf_path, **kwargs)]
 
 
 def parse_pdf_binary(pdf_binary: bytes, filename: str = "document.pdf", **kwargs) -> ParseResult:
@@ -95,5 +115,4 @@ def parse_pdf_binary(pdf_binary: bytes, filename: str = "document.pdf", **kwargs
     Returns:
         ParseResult: 解析结果
     """
-    parser = PdfParser()
-    return parser.parse_binary(pdf_binary, filename, **kwargs) 
\ No newline at end of file
+    return get_default_parser().parse_binary(pdf_binary, filename, **kwargs) 
\ No newline at end of file
@@ -0,0 +1,79 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+
+
+def document_digest(fnm, **options):
+    """sha256 of the PDF bytes and of the options which change the parse result."""
+    h = hashlib.sha256()
+    if isinstance(fnm, str):
+        with open(fnm, "rb") as f:
+            for blk in iter(lambda: f.read(1 << 20), b""):
+                h.update(blk)
+    else:
+        h.update(fnm)
+    h.update(json.dumps(options, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class PageCheckpoint:
+    """
+    Per page results of the expensive stages of one parse (OCR boxes, raw page
+    layouts, raw table structure), kept on disk so that a parse which died half
+    way can be resumed: a restarted parse of the same document with the same
+    options only computes the pages which aren't checkpointed yet.
+
+    Every result is written to a temp file and moved in place, so a crash never
+    leaves a partial checkpoint behind.
+    """
+
+    def __init__(self, root, fnm, **options):
+        self.dir = os.path.join(root, document_digest(fnm, **options))
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, stage, pn):
+        return os.path.join(self.dir, f"{stage}-{pn}.pkl")
+
+    def load(self, stage, pn):
+        try:
+            with open(self._path(stage, pn), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logging.exception(f"PageCheckpoint load {stage} of page {pn}")
+            return None
+
+    def save(self, stage, pn, obj):
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(stage, pn))
+        except Exception:
+            logging.exception(f"PageCheckpoint save {stage} of page {pn}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,81 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# the char fields page OCR reads, the others aren't sent to the workers
+CHAR_KEYS = ("text", "x0", "x1", "top", "bottom", "width", "height")
+
+_worker_parser = None
+
+
+def _init_worker(onnx_settings):
+    global _worker_parser
+    from ragflow.deepdoc.parser.pdf_parser import RAGFlowPdfParser
+    _worker_parser = RAGFlowPdfParser(ocr_only=True, onnx_settings=onnx_settings)
+
+
+def _ocr_page(task):
+    return _worker_parser.ocr_page_task(*task)
+
+
+class OcrPool:
+    """
+    Runs page OCR (text detection, char merge and recognition) in worker
+    processes, each of them holding its own OCR sessions, for CPU hosts where
+    pages would be OCRed one after another otherwise.
+    """
+
+    def __init__(self, processes=None, onnx_settings=None):
+        """
+        onnx_settings: session settings of the workers' models, OnnxSettings.many_workers()
+        suits a pool using every core.
+        """
+        # every session runs 2 intra-op threads by default
+        self.processes = max(1, int(processes or (os.cpu_count() or 2) // 2))
+        self.executor = ProcessPoolExecutor(max_workers=self.processes,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker, initargs=(onnx_settings,))
+
+    @staticmethod
+    def strip_chars(chars):
+        return [{k: c[k] for k in CHAR_KEYS if k in c} for c in chars]
+
+    def ocr_pages(self, tasks):
+        """
+        tasks: (pagenum, page image, chars, mean height, image regions, zoomin,
+        text_layer, page_pyramid, page_orientation) of every page, see `RAGFlowPdfParser.ocr_page_task`.
+        Yields (boxes, mean height) of the pages in the order of `tasks`.
+        """
+        return self.executor.map(_ocr_page, tasks)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_ocr_pool(processes, onnx_settings=None):
+    """The process wide pool with `processes` workers and these settings, created on first use."""
+    with _pools_lock:
+        if (processes, onnx_settings) not in _pools:
+            _pools[(processes, onnx_settings)] = OcrPool(processes, onnx_settings)
+        return _pools[(processes, onnx_settings)]
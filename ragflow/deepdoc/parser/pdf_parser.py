@@ -16,11 +16,14 @@
 
 import logging
 import os
+import pickle
+import queue
 import random
 import re
-import sys
+import tempfile
 import threading
-from copy import deepcopy
+from collections import OrderedDict
+from copy import copy, deepcopy
 from io import BytesIO
 from timeit import default_timer as timer
 
@@ -34,13 +37,67 @@ from pypdf import PdfReader as pdf2_read
 
 from ragflow.api import settings
 from ragflow.api.utils.file_utils import get_project_base_directory
-from ragflow.deepdoc.vision import OCR, LayoutRecognizer, Recognizer, TableStructureRecognizer
+from ragflow.deepdoc.parser.checkpoint import PageCheckpoint
+from ragflow.deepdoc.parser.ocr_pool import OcrPool, get_ocr_pool
+from ragflow.deepdoc.parser.rasterizer import RASTERIZERS, as_pil_image, get_rasterizer, get_rasterizer_pool
+from ragflow.deepdoc.vision import OCR, LayoutRecognizer, OnnxSettings, Recognizer, TableStructureRecognizer
 from ragflow.rag.nlp import rag_tokenizer
 from ragflow.rag.settings import PARALLEL_DEVICES
 
-LOCK_KEY_pdfplumber = "global_shared_lock_pdfplumber"
-if LOCK_KEY_pdfplumber not in sys.modules:
-    sys.modules[LOCK_KEY_pdfplumber] = threading.Lock()
+
+class PageImageWindow:
+    """
+    Lazily rasterized page images of one document.
+
+    Behaves like the list of PIL images `__images__` used to build, but a page
+    is only rendered when it is accessed and at most `window` rendered pages
+    are kept alive (least recently used ones are released first). Evicted pages
+    are rendered again if they are needed later, e.g. by `crop`.
+    """
+
+    def __init__(self, fnm, zoomin=3, page_from=0, page_to=299, window=8, rasterizer="pdfplumber"):
+        self.zoomin = zoomin
+        self.window = max(1, int(window))
+        self.rasterizer = get_rasterizer(rasterizer, fnm)
+        self.page_indices = list(range(len(self.rasterizer)))[page_from:page_to]
+        self.sizes = [None] * len(self.page_indices)
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.page_indices)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("page index out of range")
+        with self._lock:
+            if i in self._images:
+                self._images.move_to_end(i)
+                return self._images[i]
+        img = as_pil_image(self.rasterizer.render(self.page_indices[i], self.zoomin))
+        with self._lock:
+            self.sizes[i] = img.size
+            self._images[i] = img
+            while len(self._images) > self.window:
+                self._images.popitem(last=False)
+        return img
+
+    def size(self, i):
+        if self.sizes[i] is None:
+            return self[i].size
+        return self.sizes[i]
+
+    def close(self):
+        self._images.clear()
+        self.rasterizer.close()
 
 
 class RAGFlowPdfParser:
@@ -55,18 +112,26 @@ class RAGFlowPdfParser:
         Good luck
         ^_-
 
+        onnx_settings: ONNX Runtime session settings of the models (see OnnxSettings).
         """
 
-        self.ocr = OCR()
+        self.onnx_settings = kwargs.get("onnx_settings") or OnnxSettings()
+        self.ocr = OCR(settings=self.onnx_settings)
         self.parallel_limiter = None
         if PARALLEL_DEVICES > 1:
             self.parallel_limiter = [trio.CapacityLimiter(1) for _ in range(PARALLEL_DEVICES)]
 
+        if kwargs.get("ocr_only"):
+            # page OCR workers (see OcrPool) need neither layout, table nor concat models
+            self.page_from = 0
+            self._reset_document_state()
+            return
+
         if hasattr(self, "model_speciess"):
-            self.layouter = LayoutRecognizer("layout." + self.model_speciess)
+            self.layouter = LayoutRecognizer("layout." + self.model_speciess, self.onnx_settings)
         else:
-            self.layouter = LayoutRecognizer("layout")
-        self.tbl_det = TableStructureRecognizer()
+            self.layouter = LayoutRecognizer("layout", self.onnx_settings)
+        self.tbl_det = TableStructureRecognizer(self.onnx_settings)
 
         self.updown_cnt_mdl = xgb.Booster()
         if not settings.LIGHTEN:
@@ -91,6 +156,86 @@ class RAGFlowPdfParser:
                 model_dir, "updown_concat_xgb.model"))
 
         self.page_from = 0
+        self._reset_document_state()
+
+    def _reset_document_state(self):
+        self.pdf = None
+        self.page_images = []
+        self.page_chars = []
+        self.page_image_regions = []
+        self.lefted_chars = []
+        self.mean_height = []
+        self.mean_width = []
+        self.boxes = []
+        self.garbages = {}
+        self.page_cum_height = [0]
+        self.page_layout = []
+        self.outlines = []
+        self.rec_queue = []
+        self.rec_pending_pages = []
+        self.checkpoint = None
+        self.page_done = None
+        self.ocr_regions = None
+        self.skip_rec = None
+        self.page_pyramid = False
+        self.page_orientation = False
+        self.page_levels = OrderedDict()
+        self.page_levels_lock = threading.Lock()
+
+    def fork(self):
+        """
+        A parser for another document which shares the loaded models (OCR, layout,
+        table structure and concat models) but none of the per-document state, so
+        several forks can parse different documents in parallel threads.
+        """
+        parser = copy(self)
+        parser._reset_document_state()
+        if self.parallel_limiter:
+            # trio limiters can't be shared between concurrently running event loops
+            parser.parallel_limiter = [trio.CapacityLimiter(1) for _ in range(PARALLEL_DEVICES)]
+        return parser
+
+    def close(self):
+        """
+        Done with the document: release its page images, and the PDF handle a
+        PageImageWindow renders them with. Crops aren't possible afterwards.
+        """
+        if isinstance(getattr(self, "page_images", None), PageImageWindow):
+            self.page_images.close()
+
+    def _page_size(self, pn):
+        if isinstance(self.page_images, PageImageWindow):
+            return self.page_images.size(pn)
+        return self.page_images[pn].size
+
+    PAGE_LEVELS = 16
+
+    def _page_level(self, pn, side, img=None):
+        """
+        The page image `pn` reduced by the largest power of two which keeps its
+        longer side at least `side`, and the factors mapping coordinates on it back
+        onto the page image: that power of two, so whole pixels stay whole. Image.reduce
+        rounds the size up, mapped coordinates are to be clipped to the page image.
+        The last PAGE_LEVELS reduced images are kept, so that layout and text detection
+        of a page can share one.
+        """
+        size = img.size if img is not None else self._page_size(pn)
+        f = 1
+        while side and max(size) / (f * 2) >= side:
+            f *= 2
+        if f == 1:
+            return (img if img is not None else self.page_images[pn]), (1., 1.)
+        with self.page_levels_lock:
+            level = self.page_levels.get((pn, f))
+            if level is not None:
+                self.page_levels.move_to_end((pn, f))
+        if level is None:
+            level = (img if img is not None else self.page_images[pn]).reduce(f)
+            with self.page_levels_lock:
+                self.page_levels[(pn, f)] = level
+                while len(self.page_levels) > self.PAGE_LEVELS:
+                    self.page_levels.popitem(last=False)
+        return level, (float(f), float(f))
 
     def __char_width(self, c):
         return (c["x1"] - c["x0"]) // max(len(c["text"]), 1)
@@ -200,32 +345,49 @@ class RAGFlowPdfParser:
                     return False
         return True
 
-    def _table_transformer_job(self, ZM):
+    @staticmethod
+    def _table_regions(lts, ZM, MARGIN=10):
+        """Crop boxes, in page image pixels, of the tables among the layouts of a page."""
+        regions = []
+        for tb in [f for f in lts if f["type"] == "table"]:
+            left, top, right, bott = tb["x0"] - MARGIN, tb["top"] - MARGIN, \
+                tb["x1"] + MARGIN, tb["bottom"] + MARGIN
+            regions.append((left * ZM, top * ZM, right * ZM, bott * ZM))
+        return regions
+
+    def _table_transformer_job(self, ZM, tables=None):
+        """
+        tables: raw table structures of some pages, as recognized by `_images_pipelined`,
+        the tables of the other pages are recognized here.
+        """
         logging.debug("Table processing...")
-        imgs, pos = [], []
+        pos, page_boxes = [], []
         tbcnt = [0]
-        MARGIN = 10
+        tables = tables or {}
         self.tb_cpns = []
         assert len(self.page_layout) == len(self.page_images)
-        for p, tbls in enumerate(self.page_layout):  # for page
-            tbls = [f for f in tbls if f["type"] == "table"]
-            tbcnt.append(len(tbls))
-            if not tbls:
-                continue
-            for tb in tbls:  # for table
-                left, top, right, bott = tb["x0"] - MARGIN, tb["top"] - MARGIN, \
-                    tb["x1"] + MARGIN, tb["bottom"] + MARGIN
-                left *= ZM
-                top *= ZM
-                right *= ZM
-                bott *= ZM
-                pos.append((left, top))
-                imgs.append(self.page_images[p].crop((left, top, right, bott)))
+        for p, lts in enumerate(self.page_layout):  # for page
+            page_boxes.append(self._table_regions(lts, ZM))
+            tbcnt.append(len(page_boxes[p]))
+            pos.extend([(left, top) for left, top, _, _ in page_boxes[p]])
 
         assert len(self.page_images) == len(tbcnt) - 1
-        if not imgs:
+        if not pos:
             return
-        recos = self.tbl_det(imgs)
+
+        def recognize(pns):
+            imgs = [self.page_images[p].crop(bx) for p in pns for bx in page_boxes[p]]
+            recos = self.tbl_det(imgs)
+            cnt = np.cumsum([0] + [len(page_boxes[p]) for p in pns])
+            return [recos[cnt[i]: cnt[i + 1]] for i in range(len(pns))]
+
+        pns = [p for p in range(len(page_boxes)) if page_boxes[p] and p not in tables]
+        if self.checkpoint:
+            page_recos = self._checkpointed("tsr", pns, recognize, 16)
+        else:
+            page_recos = recognize(pns)
+        page_recos = {**dict(zip(pns, page_recos)), **tables}
+        recos = [r for p in range(len(page_boxes)) if page_boxes[p] for r in page_recos[p]]
         tbcnt = np.cumsum(tbcnt)
         for i in range(len(tbcnt) - 1):  # for page
             pg = []
@@ -291,24 +453,145 @@ class RAGFlowPdfParser:
                 b["H_right"] = spans[ii]["x1"]
                 b["SP"] = ii
 
-    def __ocr(self, pagenum, img, chars, ZM=3, device_id: int | None = None):
+    @staticmethod
+    def _text_layer_usable(chars, min_chars=16, min_valid_ratio=0.9):
+        """
+        Whether the native text layer of a page can replace OCR detection:
+        enough glyphs, and almost all of them mapped to real characters.
+        """
+        glyphs = [c for c in chars if c["text"].strip()]
+        if len(glyphs) < min_chars:
+            return False
+        valid = [c for c in glyphs
+                 if not re.match(r"\(cid *: *[0-9]+ *\)", c["text"]) and not re.search(r"[\ufffd\ue000-\uf8ff]", c["text"])]
+        return len(valid) / len(glyphs) >= min_valid_ratio
+
+    def _text_layer_boxes(self, pagenum, chars):
+        """
+        Build text boxes straight from pdfplumber chars: chars are grouped into
+        lines, and lines are split where the horizontal gap is wider than a
+        character height, much like the text detector splits them.
+        """
+        chars = [c for c in chars if c["text"]]
+        if not chars:
+            return []
+        lines = []
+        for c in sorted(chars, key=lambda c: (c["top"], c["x0"])):
+            mid = (c["top"] + c["bottom"]) / 2
+            if lines and lines[-1]["top"] <= mid <= lines[-1]["bottom"]:
+                lines[-1]["chars"].append(c)
+                lines[-1]["bottom"] = max(lines[-1]["bottom"], c["bottom"])
+                continue
+            lines.append({"top": c["top"], "bottom": c["bottom"], "chars": [c]})
+
+        bxs = []
+        for ln in lines:
+            b = None
+            for c in sorted(ln["chars"], key=lambda c: c["x0"]):
+                if b is None or c["x0"] - b["x1"] > max(c["height"], b["bottom"] - b["top"]):
+                    b = {"x0": c["x0"], "x1": c["x1"], "top": c["top"], "bottom": c["bottom"],
+                         "text": "", "txt": "", "page_number": pagenum}
+                    bxs.append(b)
+                b["x1"] = max(b["x1"], c["x1"])
+                b["top"] = min(b["top"], c["top"])
+                b["bottom"] = max(b["bottom"], c["bottom"])
+                if c["text"] == " ":
+                    if b["text"] and re.match(r"[0-9a-zA-Zа-яА-Я,.?;:!%%]", b["text"][-1]):
+                        b["text"] += " "
+                else:
+                    b["text"] += c["text"]
+        return [b for b in bxs if b["text"].strip()]
+
+    def _uncovered_image_regions(self, pagenum, chars, ZM, img):
+        """
+        Embedded images of a page which carry no text layer, in page coordinates.
+        Tiny images (logos, bullets) are ignored.
+        """
+        page_area = img.size[0] * img.size[1] / ZM / ZM
+        regions = []
+        for x0, top, x1, bottom in self.page_image_regions[pagenum - 1]:
+            if (x1 - x0) * (bottom - top) < 0.01 * page_area:
+                continue
+            if any(x0 <= (c["x0"] + c["x1"]) / 2 <= x1 and top <= (c["top"] + c["bottom"]) / 2 <= bottom for c in chars):
+                continue
+            regions.append((x0, top, x1, bottom))
+        return regions
+
+    def __detect_regions(self, img, regions, ZM=3, device_id: int | None = None):
+        dets = []
+        for x0, top, x1, bottom in regions:
+            left, upper = max(0, int(x0 * ZM)), max(0, int(top * ZM))
+            right, lower = min(img.size[0], int(x1 * ZM)), min(img.size[1], int(bottom * ZM))
+            if right - left < 8 or lower - upper < 8:
+                continue
+            res = self.ocr.detect(np.array(img.crop((left, upper, right, lower))), device_id)
+            if isinstance(res, tuple):
+                continue
+            dets.extend([(np.array(box) + [left, upper], t) for box, t in res])
+        return dets
+
+    def __detect_oriented(self, img, det_img, scale, device_id: int | None = None):
+        """
+        Text boxes of the page image `img`, detected on `det_img`, which is `img`
+        downscaled by `scale`, and the rotation (the `k` of np.rot90) which turns the
+        page upright, None when it isn't known.
+        With `page_orientation`, a page found rotated is detected again turned upright,
+        and the boxes are mapped back onto `img`.
+        """
+        def detect(im):
+            bxs = self.ocr.detect(im, device_id)
+            return [] if isinstance(bxs, tuple) else list(bxs)
+
+        def to_page(box):
+            return np.clip(box * scale, 0, img.size)
+
+        bxs = detect(det_img)
+        bxs = [(to_page(np.array(box)), t) for box, t in bxs]
+        if not self.page_orientation or not bxs:
+            return bxs, None
+        orientation = self.ocr.page_orientation(np.array(img), [box for box, _ in bxs], device_id)
+        if orientation:
+            bxs = [(to_page(self.ocr.unrotate_box(box, orientation, det_img.shape)), t)
+                   for box, t in detect(np.ascontiguousarray(np.rot90(det_img, orientation)))]
+            logging.info(f"__ocr page turned by {orientation * 90}° to be upright")
+        return bxs, orientation
+
+    def __ocr(self, pagenum, img, chars, ZM=3, device_id: int | None = None, text_layer=False):
         start = timer()
-        bxs = self.ocr.detect(np.array(img), device_id)
-        logging.info(f"__ocr detecting boxes of a image cost ({timer() - start}s)")
+        orientation = None
+        if self.ocr_regions:
+            bxs = self.__detect_regions(img, self.ocr_regions(pagenum - 1, img), ZM, device_id)
+            logging.info(f"__ocr detecting boxes of the regions to OCR cost ({timer() - start}s)")
+        elif text_layer:
+            bxs = self.__detect_regions(img, self._uncovered_image_regions(pagenum, chars, ZM, img), ZM, device_id)
+            logging.info(f"__ocr detecting boxes of image regions cost ({timer() - start}s)")
+        elif self.page_pyramid:
+            level, scale = self._page_level(pagenum - 1, self.ocr.text_detector[0].input_side(), img)
+            bxs, orientation = self.__detect_oriented(img, np.array(level), scale, device_id)
+            logging.info(f"__ocr detecting boxes of a downscaled image cost ({timer() - start}s)")
+        elif self.page_orientation:
+            bxs, orientation = self.__detect_oriented(img, np.array(img), (1, 1), device_id)
+            logging.info(f"__ocr detecting boxes of a image cost ({timer() - start}s)")
+        else:
+            bxs = self.ocr.detect(np.array(img), device_id)
+            logging.info(f"__ocr detecting boxes of a image cost ({timer() - start}s)")
 
         start = timer()
-        if not bxs:
+        if not bxs and not text_layer:
+            self._page_ocred(pagenum, [])
             self.boxes.append([])
             return
         bxs = [(line[0], line[1][0]) for line in bxs]
-        bxs = Recognizer.sort_Y_firstly(
-            [{"x0": b[0][0] / ZM, "x1": b[1][0] / ZM,
-              "top": b[0][1] / ZM, "text": "", "txt": t,
-              "bottom": b[-1][1] / ZM,
-              "chars": [],
-              "page_number": pagenum} for b, t in bxs if b[0][0] <= b[1][0] and b[0][1] <= b[-1][1]],
-            self.mean_height[pagenum-1] / 3
-        )
+        bxs = [{"x0": b[0][0] / ZM, "x1": b[1][0] / ZM,
+                "top": b[0][1] / ZM, "text": "", "txt": t,
+                "bottom": b[-1][1] / ZM,
+                "chars": [],
+                "page_number": pagenum} for b, t in bxs if b[0][0] <= b[1][0] and b[0][1] <= b[-1][1]]
+        if text_layer:
+            # glyphs of the text layer become boxes by themselves, the detected ones are left for recognition
+            bxs.extend(self._text_layer_boxes(pagenum, chars))
+            chars = []
+        bxs = Recognizer.sort_Y_firstly(bxs, self.mean_height[pagenum-1] / 3)
 
         # merge chars in the same rect
         for c in chars:
@@ -324,8 +607,8 @@ class RAGFlowPdfParser:
             bxs[ii]["chars"].append(c)
 
         for b in bxs:
-            if not b["chars"]:
-                del b["chars"]
+            if not b.get("chars"):
+                b.pop("chars", None)
                 continue
             m_ht = np.mean([c["height"] for c in b["chars"]])
             for c in Recognizer.sort_Y_firstly(b["chars"], m_ht):
@@ -337,6 +620,9 @@ class RAGFlowPdfParser:
             del b["chars"]
 
         logging.info(f"__ocr sorting {len(chars)} chars cost {timer() - start}s")
+        if self.skip_rec:
+            skipped = self.skip_rec(pagenum - 1, img, bxs)
+            bxs = [b for b, skip in zip(bxs, skipped) if b["text"] or not skip]
         start = timer()
         boxes_to_reg = []
         img_np = np.array(img)
@@ -344,24 +630,131 @@ class RAGFlowPdfParser:
             if not b["text"]:
                 left, right, top, bott = b["x0"] * ZM, b["x1"] * \
                                          ZM, b["top"] * ZM, b["bottom"] * ZM
-                b["box_image"] = self.ocr.get_rotate_crop_image(img_np, np.array([[left, top], [right, top], [right, bott], [left, bott]], dtype=np.float32))
+                # the orientation of tall crops is tried out when recognizing them in a batch
+                b["box_image"] = self.ocr.get_rotate_crop_image(img_np, np.array([[left, top], [right, top], [right, bott], [left, bott]], dtype=np.float32), orient=False)
+                if orientation is not None:
+                    # upright as the page is, no need to try it out
+                    b["box_image"] = np.rot90(b["box_image"], orientation)
+                b["box_orient"] = orientation is None
                 boxes_to_reg.append(b)
             del b["txt"]
-        texts = self.ocr.recognize_batch([b["box_image"] for b in boxes_to_reg], device_id)
+        if self.rec_queue_size:
+            # recognized later together with the crops of the following pages. The crops
+            # may be views of the page array, copied so that it isn't kept alive meanwhile
+            for b in boxes_to_reg:
+                b["box_image"] = b["box_image"].copy()
+            self.boxes.append(bxs)
+            self.rec_queue.extend(boxes_to_reg)
+            self.rec_pending_pages.append(pagenum)
+            if len(self.rec_queue) >= self.rec_queue_size:
+                self._flush_rec_queue(device_id)
+            return
+        texts = self.ocr.recognize_batch([b["box_image"] for b in boxes_to_reg], device_id,
+                                         [b["box_orient"] for b in boxes_to_reg])
         for i in range(len(boxes_to_reg)):
             boxes_to_reg[i]["text"] = texts[i]
             del boxes_to_reg[i]["box_image"]
+            del boxes_to_reg[i]["box_orient"]
         logging.info(f"__ocr recognize {len(bxs)} boxes cost {timer() - start}s")
+        self.boxes.append(self._finish_page_boxes(pagenum, bxs))
+
+    def ocr_page_task(self, pagenum, img, chars, mean_height, regions, ZM=3, text_layer=False, page_pyramid=False,
+                      page_orientation=False):
+        """
+        OCR a single page on its own, as the workers of OcrPool do.
+        Returns the boxes of the page and its mean char height.
+        """
+        self._reset_document_state()
+        self.rec_queue_size = 0
+        self.page_pyramid = page_pyramid
+        self.page_orientation = page_orientation
+        self.mean_height = [mean_height]
+        self.page_image_regions = [regions]
+        self.__ocr(1, img, chars, ZM, None, text_layer)
+        for b in self.boxes[0]:
+            b["page_number"] = pagenum
+        return self.boxes[0], self.mean_height[0]
+
+    def _finish_page_boxes(self, pagenum, bxs):
         bxs = [b for b in bxs if b["text"]]
         if self.mean_height[pagenum-1] == 0:
             self.mean_height[pagenum-1] = np.median([b["bottom"] - b["top"]
                                               for b in bxs])
-        self.boxes.append(bxs)
+        self._page_ocred(pagenum, bxs)
+        return bxs
+
+    def _page_ocred(self, pagenum, bxs):
+        """Called once the boxes of a page are final."""
+        if self.checkpoint:
+            self.checkpoint.save("ocr", self.page_from + pagenum - 1,
+                                 {"boxes": bxs, "mean_height": self.mean_height[pagenum - 1]})
+        if self.page_done:
+            self.page_done(pagenum, bxs)
+
+    def _restore_page_boxes(self, pagenum):
+        """Take the OCR result of a page from the checkpoint, if it's there."""
+        if not self.checkpoint:
+            return False
+        ck = self.checkpoint.load("ocr", self.page_from + pagenum - 1)
+        if ck is None:
+            return False
+        self.boxes.append(ck["boxes"])
+        self.mean_height[pagenum - 1] = ck["mean_height"]
+        if self.page_done:
+            self.page_done(pagenum, ck["boxes"])
+        return True
 
-    def _layouts_rec(self, ZM, drop=True):
+    def _checkpointed(self, stage, pns, compute, batch_size):
+        """
+        Per page results of `stage` for the pages `pns`: taken from the checkpoint
+        where present, the others computed `batch_size` pages at a time by
+        `compute(pns)` and checkpointed.
+        """
+        res = {pn: self.checkpoint.load(stage, self.page_from + pn) for pn in pns}
+        todo = [pn for pn in pns if res[pn] is None]
+        for i in range(0, len(todo), batch_size):
+            for pn, r in zip(todo[i:i + batch_size], compute(todo[i:i + batch_size])):
+                self.checkpoint.save(stage, self.page_from + pn, r)
+                res[pn] = r
+        if len(todo) < len(pns):
+            logging.info(f"{stage} of {len(pns) - len(todo)} pages taken from the checkpoint")
+        return [res[pn] for pn in pns]
+
+    def _flush_rec_queue(self, device_id: int | None = None):
+        """
+        Recognize the crops queued by `__ocr` across pages in one call, so the
+        recognizer gets full width-sorted batches, and scatter the texts back.
+        """
+        start = timer()
+        queue, self.rec_queue = self.rec_queue, []
+        texts = self.ocr.recognize_batch([b["box_image"] for b in queue], device_id,
+                                         [b["box_orient"] for b in queue]) if queue else []
+        for b, txt in zip(queue, texts):
+            b["text"] = txt
+            del b["box_image"]
+            del b["box_orient"]
+        for pagenum in self.rec_pending_pages:
+            self.boxes[pagenum - 1] = self._finish_page_boxes(pagenum, self.boxes[pagenum - 1])
+        logging.info(f"__ocr recognize {len(queue)} boxes of {len(self.rec_pending_pages)} pages cost {timer() - start}s")
+        self.rec_pending_pages = []
+
+    def _layouts_rec(self, ZM, drop=True, layouts=None):
+        """
+        layouts: raw layouts of the pages, when recognized already by `_images_pipelined`.
+        """
         assert len(self.page_images) == len(self.boxes)
+        batch_size = 16
+        if isinstance(self.page_images, PageImageWindow):
+            batch_size = min(batch_size, self.page_images.window)
+        pns = list(range(len(self.page_images)))
+        if layouts is None and self.checkpoint:
+            layouts = self._checkpointed("layout", pns, lambda pns: self._predict_layouts(pns, batch_size=batch_size),
+                                         batch_size)
+        elif layouts is None and self.page_pyramid:
+            layouts = [lt for i in range(0, len(pns), batch_size)
+                       for lt in self._predict_layouts(pns[i:i + batch_size], batch_size=batch_size)]
         self.boxes, self.page_layout = self.layouter(
-            self.page_images, self.boxes, ZM, drop=drop)
+            self.page_images, self.boxes, ZM, batch_size=batch_size, drop=drop, layouts=layouts)
         # cumlative Y
         for i in range(len(self.boxes)):
             self.boxes[i]["top"] += \
@@ -501,6 +894,9 @@ class RAGFlowPdfParser:
 
             def dfs(up, dp):
                 chunks.append(up)
+                # collect the candidates first and score all model pairs in one call;
+                # the first positive one, or else the forced one, is concatenated
+                cands, feas, forced, err = [], [], None, None
                 i = dp
                 while i < min(dp + 12, len(boxes)):
                     ydis = self._y_dis(up, boxes[i])
@@ -538,20 +934,30 @@ class RAGFlowPdfParser:
                     if i - dp < 5 and up.get("layout_type") == "text":
                         if up.get("layoutno", "1") == down.get(
                                 "layoutno", "2"):
-                            dfs(down, i + 1)
-                            boxes.pop(i)
-                            return
+                            forced = i
+                            break
                         i += 1
                         continue
 
-                    fea = self._updown_concat_features(up, down)
-                    if self.updown_cnt_mdl.predict(
-                            xgb.DMatrix([fea]))[0] <= 0.5:
-                        i += 1
-                        continue
-                    dfs(down, i + 1)
-                    boxes.pop(i)
+                    try:
+                        feas.append(self._updown_concat_features(up, down))
+                    except Exception as e:
+                        # only matters if none of the earlier candidates is taken
+                        err = e
+                        break
+                    cands.append(i)
+                    i += 1
+
+                nxt = forced
+                if feas:
+                    scores = self.updown_cnt_mdl.inplace_predict(np.array(feas, dtype=np.float32))
+                    nxt = next((i for i, score in zip(cands, scores) if score > 0.5), forced)
+                if nxt is None and err:
+                    raise err
+                if nxt is None:
                     return
+                dfs(boxes[nxt], nxt + 1)
+                boxes.pop(nxt)
 
             dfs(boxes[0], 1)
             boxes.pop(0)
@@ -904,8 +1310,8 @@ class RAGFlowPdfParser:
         page_images_cnt = len(self.page_images)
         if pn[-1] - 1 >= page_images_cnt:
             return ""
-        while bott * ZM > self.page_images[pn[-1] - 1].size[1]:
-            bott -= self.page_images[pn[-1] - 1].size[1] / ZM
+        while bott * ZM > self._page_size(pn[-1] - 1)[1]:
+            bott -= self._page_size(pn[-1] - 1)[1] / ZM
             pn.append(pn[-1] + 1)
             if pn[-1] - 1 >= page_images_cnt:
                 return ""
@@ -926,7 +1332,7 @@ class RAGFlowPdfParser:
             if b.get("layout_type"):
                 return True
             if width(
-                    b) > self.page_images[b["page_number"] - 1].size[0] / ZM / 3:
+                    b) > self._page_size(b["page_number"] - 1)[0] / ZM / 3:
                 return True
             if b["bottom"] - b["top"] > self.mean_height[b["page_number"] - 1]:
                 return True
@@ -936,7 +1342,7 @@ class RAGFlowPdfParser:
         while boxes:
             lines = []
             widths = []
-            pw = self.page_images[boxes[0]["page_number"] - 1].size[0] / ZM
+            pw = self._page_size(boxes[0]["page_number"] - 1)[0] / ZM
             mh = self.mean_height[boxes[0]["page_number"] - 1]
             mj = self.proj_match(
                 boxes[0]["text"]) or boxes[0].get(
@@ -989,9 +1395,8 @@ class RAGFlowPdfParser:
     @staticmethod
     def total_page_number(fnm, binary=None):
         try:
-            with sys.modules[LOCK_KEY_pdfplumber]:
-                pdf = pdfplumber.open(
-                    fnm) if not binary else pdfplumber.open(BytesIO(binary))
+            pdf = pdfplumber.open(
+                fnm) if not binary else pdfplumber.open(BytesIO(binary))
             total_page = len(pdf.pages)
             pdf.close()
             return total_page
@@ -999,36 +1404,104 @@ class RAGFlowPdfParser:
             logging.exception("total_page_number")
 
     def __images__(self, fnm, zoomin=3, page_from=0,
-                   page_to=299, callback=None):
-        self.lefted_chars = []
-        self.mean_height = []
-        self.mean_width = []
-        self.boxes = []
-        self.garbages = {}
-        self.page_cum_height = [0]
-        self.page_layout = []
+                   page_to=299, callback=None, page_window=None, text_layer=False, rec_queue_size=0,
+                   raster_processes=0, rasterizer="pdfplumber", checkpoint_dir=None, ocr_processes=0,
+                   page_done=None, ocr_regions=None, skip_rec=None, page_pyramid=False, page_orientation=False):
+        """
+        page_window: if set, pages are rasterized on demand and at most
+        `page_window` page images are kept in memory (see PageImageWindow).
+        text_layer: build text boxes from the PDF text layer on pages where it is
+        usable, and only run OCR on scanned pages or on images without text.
+        rec_queue_size: if set, crops to recognize are queued across pages and
+        recognized once the queue holds that many of them, instead of page by page.
+        raster_processes: if set, pages are rasterized by a shared pool of that many
+        worker processes instead of in this process (see RasterizerPool).
+        rasterizer: the backend page images are rendered with, "pdfplumber" or "pymupdf".
+        checkpoint_dir: if set, the per page results of OCR, layout and table structure
+        recognition are checkpointed under it, and the pages already checkpointed by
+        an earlier, interrupted parse of the same document are not computed again.
+        Pages are still all rasterized on resume: the crops of tables, figures and
+        chunk positions are taken from the page images of checkpointed pages too.
+        ocr_processes: if set and there are no parallel devices, pages are OCRed by a
+        shared pool of that many worker processes instead of one after another in
+        this process (see OcrPool).
+        page_done: called with the page number and the boxes of every page, as soon
+        as its OCR is finished (see `_images_pipelined`).
+        ocr_regions: called with the index and the image of every page, returns the
+        regions, in page coordinates, which are OCRed instead of the whole page
+        (see `extract_tables`).
+        skip_rec: called with the index and the image of every page and its detected
+        boxes, flags the boxes without text from the PDF which are not recognized
+        (see `_images_layout_first`).
+        page_pyramid: text detection and layout recognition run on page images
+        reduced to about the input sizes of their models (see `_page_level`), only
+        the crops for text recognition and table structure come from the full ones.
+        page_orientation: the rotation of every OCRed page is voted by its largest text
+        boxes (see `OCR.page_orientation`). A page found rotated is detected again
+        turned upright, and the text boxes of a page whose rotation is known are
+        recognized turned as it is, without trying out their orientations one by one.
+        """
+        if rasterizer not in RASTERIZERS:
+            raise ValueError(f"Unknown rasterizer: {rasterizer}, should be one of {list(RASTERIZERS.keys())}")
+        self.close()
+        self._reset_document_state()
         self.page_from = page_from
+        self.page_done = page_done
+        self.ocr_regions = ocr_regions
+        self.skip_rec = skip_rec
+        self.page_pyramid = page_pyramid
+        self.page_orientation = page_orientation
+        # the regions and the boxes to skip are found in this process
+        ocr_processes = ocr_processes if not ocr_regions and not skip_rec else 0
+        if checkpoint_dir:
+            options = dict(zoomin=zoomin, text_layer=text_layer, rasterizer=rasterizer,
+                           **self.onnx_settings.result_settings())
+            if skip_rec:
+                options["layout_first"] = True
+            if page_pyramid:
+                options["page_pyramid"] = True
+            if page_orientation:
+                options["page_orientation"] = True
+            self.checkpoint = PageCheckpoint(checkpoint_dir, fnm, **options)
+        ocr_processes = ocr_processes if not self.parallel_limiter else 0
+        # cross-page recognition only applies when pages are OCRed one after another
+        self.rec_queue_size = rec_queue_size if not self.parallel_limiter and not ocr_processes else 0
         start = timer()
         try:
-            with sys.modules[LOCK_KEY_pdfplumber]:
-                with (pdfplumber.open(fnm) if isinstance(fnm, str) else pdfplumber.open(BytesIO(fnm))) as pdf:
-                    self.pdf = pdf
-                    self.page_images = [p.to_image(resolution=72 * zoomin, antialias=True).annotated for i, p in
-                                        enumerate(self.pdf.pages[page_from:page_to])]
-
+            # every document has its own handle, only pdfium renders are serialized
+            with (pdfplumber.open(fnm) if isinstance(fnm, str) else pdfplumber.open(BytesIO(fnm))) as pdf:
+                self.pdf = pdf
+                page_indices = list(range(len(self.pdf.pages)))[page_from:page_to]
+                if raster_processes and not page_window:
+                    self.page_images = [as_pil_image(img) for img in get_rasterizer_pool(raster_processes).render(
+                        fnm, zoomin, page_indices, rasterizer)]
+                elif not page_window:
+                    with get_rasterizer(rasterizer, fnm, pdf) as r:
+                        self.page_images = [as_pil_image(r.render(i, zoomin)) for i in page_indices]
+
+                try:
+                    self.page_chars = [[c for c in page.dedupe_chars().chars if self._has_color(c)] for page in self.pdf.pages[page_from:page_to]]
+                except Exception as e:
+                    logging.warning(f"Failed to extract characters for pages {page_from}-{page_to}: {str(e)}")
+                    self.page_chars = [[] for _ in range(page_to - page_from)]  # If failed to extract, using empty list instead.
+
+                if text_layer:
                     try:
-                        self.page_chars = [[c for c in page.dedupe_chars().chars if self._has_color(c)] for page in self.pdf.pages[page_from:page_to]]
+                        self.page_image_regions = [[(im["x0"], im["top"], im["x1"], im["bottom"]) for im in page.images]
+                                                   for page in self.pdf.pages[page_from:page_to]]
                     except Exception as e:
-                        logging.warning(f"Failed to extract characters for pages {page_from}-{page_to}: {str(e)}")
-                        self.page_chars = [[] for _ in range(page_to - page_from)]  # If failed to extract, using empty list instead.
+                        logging.warning(f"Failed to extract images for pages {page_from}-{page_to}: {str(e)}")
+                        self.page_image_regions = [[] for _ in range(len(self.page_chars))]
 
-                    self.total_page = len(self.pdf.pages)
+                self.total_page = len(self.pdf.pages)
+
+            if page_window:
+                self.page_images = PageImageWindow(fnm, zoomin, page_from, page_to, page_window, rasterizer)
 
         except Exception:
             logging.exception("RAGFlowPdfParser __images__")
         logging.info(f"__images__ dedupe_chars cost {timer() - start}s")
 
-        self.outlines = []
         try:
             with (pdf2_read(fnm if isinstance(fnm, str)
                             else BytesIO(fnm))) as pdf:
@@ -1060,7 +1533,7 @@ class RAGFlowPdfParser:
         else:
             self.is_english = False
 
-        async def __img_ocr(i, id, img, chars, limiter):
+        def __space_chars(chars):
             j = 0
             while j + 1 < len(chars):
                 if chars[j]["text"] and chars[j + 1]["text"] \
@@ -1070,18 +1543,29 @@ class RAGFlowPdfParser:
                     chars[j]["text"] += " "
                 j += 1
 
+        async def __img_ocr(i, id, img, chars, limiter, use_text_layer=False):
+            __space_chars(chars)
             if limiter:
                 async with limiter:
-                    await trio.to_thread.run_sync(lambda: self.__ocr(i + 1, img, chars, zoomin, id))
+                    await trio.to_thread.run_sync(lambda: self.__ocr(i + 1, img, chars, zoomin, id, use_text_layer))
             else:
-                self.__ocr(i + 1, img, chars, zoomin, id)
+                self.__ocr(i + 1, img, chars, zoomin, id, use_text_layer)
 
             if callback and i % 6 == 5:
                 callback(prog=(i + 1) * 0.6 / len(self.page_images), msg="")
 
+        def __pool_ocr(pool, tasks):
+            for task, (bxs, mean_height) in zip(tasks, pool.ocr_pages(tasks)):
+                i = task[0] - 1
+                self.boxes[i] = bxs
+                self.mean_height[i] = mean_height
+                self._page_ocred(i + 1, bxs)
+                if callback and i % 6 == 5:
+                    callback(prog=(i + 1) * 0.6 / len(self.page_images), msg="")
+
         async def __img_ocr_launcher():
             def __ocr_preprocess():
-                chars = self.page_chars[i] if not self.is_english else []
+                chars = self.page_chars[i] if not self.is_english or use_text_layer else []
                 self.mean_height.append(
                     np.median(sorted([c["height"] for c in chars])) if chars else 0
                 )
@@ -1094,15 +1578,42 @@ class RAGFlowPdfParser:
             if self.parallel_limiter:
                 async with trio.open_nursery() as nursery:
                     for i, img in enumerate(self.page_images):
+                        use_text_layer = text_layer and self._text_layer_usable(self.page_chars[i])
                         chars = __ocr_preprocess()
+                        if self._restore_page_boxes(i + 1):
+                            continue
 
                         nursery.start_soon(__img_ocr, i, i % PARALLEL_DEVICES, img, chars,
-                                           self.parallel_limiter[i % PARALLEL_DEVICES])
+                                           self.parallel_limiter[i % PARALLEL_DEVICES], use_text_layer)
                         await trio.sleep(0.1)
+            elif ocr_processes:
+                pool = get_ocr_pool(ocr_processes, self.onnx_settings)
+                tasks = []
+                for i, img in enumerate(self.page_images):
+                    use_text_layer = text_layer and self._text_layer_usable(self.page_chars[i])
+                    chars = __ocr_preprocess()
+                    if self._restore_page_boxes(i + 1):
+                        continue
+                    __space_chars(chars)
+                    # filled in page order once the workers are done with it
+                    self.boxes.append(None)
+                    tasks.append((i + 1, img, OcrPool.strip_chars(chars), self.mean_height[i],
+                                  self.page_image_regions[i] if use_text_layer else [], zoomin, use_text_layer,
+                                  page_pyramid, page_orientation))
+                    # bounded, so that page images of a window aren't all held at once
+                    if len(tasks) >= 2 * pool.processes:
+                        __pool_ocr(pool, tasks)
+                        tasks = []
+                __pool_ocr(pool, tasks)
             else:
                 for i, img in enumerate(self.page_images):
+                    use_text_layer = text_layer and self._text_layer_usable(self.page_chars[i])
                     chars = __ocr_preprocess()
-                    await __img_ocr(i, 0, img, chars, None)
+                    if self._restore_page_boxes(i + 1):
+                        continue
+                    await __img_ocr(i, 0, img, chars, None, use_text_layer)
+                if self.rec_queue_size:
+                    self._flush_rec_queue()
 
         start = timer()
 
@@ -1121,19 +1632,289 @@ class RAGFlowPdfParser:
         self.page_cum_height = np.cumsum(self.page_cum_height)
         assert len(self.page_cum_height) == len(self.page_images) + 1
         if len(self.boxes) == 0 and zoomin < 9:
-            self.__images__(fnm, zoomin * 3, page_from, page_to, callback)
+            self.__images__(fnm, zoomin * 3, page_from, page_to, callback, page_window, text_layer, rec_queue_size,
+                            raster_processes, rasterizer, checkpoint_dir, ocr_processes, page_done, ocr_regions,
+                            skip_rec, page_pyramid, page_orientation)
 
-    def __call__(self, fnm, need_image=True, zoomin=3, return_html=False):
-        self.__images__(fnm, zoomin)
-        self._layouts_rec(zoomin)
-        self._table_transformer_job(zoomin)
+    def _images_pipelined(self, fnm, zoomin=3, page_from=0, page_to=299, callback=None, queue_size=8, **kwargs):
+        """
+        `__images__`, while another thread recognizes the layouts and table structures
+        of the pages OCRed so far, so those models work as the following pages are
+        still in OCR. OCR hands the pages over through a queue of at most `queue_size`
+        pages. Returns the raw layouts of the pages and the raw table structures of
+        the pages with tables, to be passed to `_layouts_rec` and
+        `_table_transformer_job`, which then give the same result as without pipelining.
+        """
+        pages = queue.Queue(maxsize=max(1, queue_size))
+        layouts, tables, errors = {}, {}, []
+        batch_size = 16
+        if kwargs.get("page_window"):
+            batch_size = min(batch_size, max(1, int(kwargs["page_window"])))
+
+        def recognize(batch):
+            def predict(pns):
+                return self._predict_layouts(pns, batch_size=batch_size)
+
+            pns = [pn for pn, _ in batch]
+            lts = self._checkpointed("layout", pns, predict, batch_size) if self.checkpoint else predict(pns)
+            for (pn, bxs), lt in zip(batch, lts):
+                layouts[pn] = lt
+                regions = self._table_regions(self.layouter.page_layout(bxs, lt, zoomin, pn), zoomin)
+                if not regions:
+                    continue
+
+                def structure(pns):
+                    return [self.tbl_det([self.page_images[pn].crop(r) for r in regions])]
+
+                tables[pn] = (self._checkpointed("tsr", [pn], structure, 1) if self.checkpoint else structure([pn]))[0]
+
+        def consume():
+            done = False
+            while not done:
+                batch = [pages.get()]
+                while batch[-1] is not None and len(batch) < batch_size:
+                    try:
+                        batch.append(pages.get_nowait())
+                    except queue.Empty:
+                        break
+                done = batch[-1] is None
+                batch = [b for b in batch if b is not None]
+                # after a failure, keep draining the queue so that OCR never blocks on it
+                if batch and not errors:
+                    try:
+                        recognize(batch)
+                    except Exception as e:
+                        logging.exception("RAGFlowPdfParser _images_pipelined")
+                        errors.append(e)
+
+        worker = threading.Thread(target=consume, daemon=True)
+        worker.start()
+        try:
+            self.__images__(fnm, zoomin, page_from, page_to, callback,
+                            page_done=lambda pagenum, bxs: pages.put((pagenum - 1, bxs)), **kwargs)
+        finally:
+            pages.put(None)
+            worker.join()
+        if errors:
+            raise errors[0]
+        if len(layouts) < len(self.page_images):
+            logging.warning("_images_pipelined: layouts of some pages are missing, recognizing them all again")
+            return None, tables
+        return [layouts[pn] for pn in range(len(self.page_images))], tables
+
+    OCR_SNAPSHOT_VERSION = 1
+
+    def dump_ocr_snapshot(self, path, zoomin=3):
+        """
+        Save the state `__images__` leaves behind (OCR boxes of every page, mean
+        char heights/widths, page geometry and the page images as PNG) to `path`,
+        so that layout, table and merge stages can be re-run by `load_ocr_snapshot`
+        without rasterizing and OCRing the document again.
+        Must be called right after `__images__`.
+        """
+        images = []
+        for img in self.page_images:
+            buf = BytesIO()
+            img.save(buf, format="PNG", compress_level=1)
+            images.append(buf.getvalue())
+        snapshot = {
+            "version": self.OCR_SNAPSHOT_VERSION,
+            "zoomin": zoomin,
+            "page_from": self.page_from,
+            "total_page": getattr(self, "total_page", len(images)),
+            "boxes": self.boxes,
+            "mean_height": self.mean_height,
+            "mean_width": self.mean_width,
+            "page_cum_height": np.asarray(self.page_cum_height).tolist(),
+            "is_english": self.is_english,
+            "outlines": self.outlines,
+            "page_images": images,
+        }
+        dirname = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def load_ocr_snapshot(self, path, zoomin=3):
+        """Restore the state saved by `dump_ocr_snapshot`, in place of running `__images__`."""
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        if snapshot.get("version") != self.OCR_SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported OCR snapshot version: {snapshot.get('version')}")
+        if snapshot["zoomin"] != zoomin:
+            raise ValueError(f"OCR snapshot was taken with zoomin={snapshot['zoomin']}, not {zoomin}")
+        self.close()
+        self._reset_document_state()
+        self.page_from = snapshot["page_from"]
+        self.total_page = snapshot["total_page"]
+        self.boxes = snapshot["boxes"]
+        self.mean_height = snapshot["mean_height"]
+        self.mean_width = snapshot["mean_width"]
+        self.page_cum_height = np.array(snapshot["page_cum_height"])
+        self.is_english = snapshot["is_english"]
+        self.outlines = snapshot["outlines"]
+        self.page_images = [Image.open(BytesIO(b)).convert("RGB") for b in snapshot["page_images"]]
+
+    def _ocr_stage(self, fnm, zoomin=3, page_from=0, page_to=299, callback=None, ocr_snapshot=None,
+                   pipeline_queue_size=0, layout_first=False, **kwargs):
+        """
+        The OCR stage `__call__` starts with: restored from `ocr_snapshot` if it
+        exists, otherwise run by `_images_layout_first`, `_images_pipelined` or
+        `__images__` (which get `kwargs`) and then saved to `ocr_snapshot`.
+        Returns the layouts and tables recognized along the way, None for those
+        left to `_layouts_rec` and `_table_transformer_job`.
+        """
+        start = timer()
+        if ocr_snapshot and os.path.exists(ocr_snapshot):
+            # re-run the stages after OCR on the saved OCR output
+            self.load_ocr_snapshot(ocr_snapshot, zoomin)
+            self.page_pyramid = kwargs.get("page_pyramid", False)
+            if callback:
+                callback(msg="OCR snapshot loaded ({:.2f}s)".format(timer() - start))
+            return None, None
+        if callback:
+            callback(msg="OCR started")
+        layouts, tables = None, None
+        if layout_first:
+            # only the boxes kept by the layouts are recognized
+            layouts = self._images_layout_first(fnm, zoomin, page_from, page_to, callback, **kwargs)
+        elif pipeline_queue_size:
+            # layouts and tables are recognized while OCR goes on
+            layouts, tables = self._images_pipelined(fnm, zoomin, page_from, page_to, callback,
+                                                     pipeline_queue_size, **kwargs)
+        else:
+            self.__images__(fnm, zoomin, page_from, page_to, callback, **kwargs)
+        if ocr_snapshot:
+            self.dump_ocr_snapshot(ocr_snapshot, zoomin)
+        if callback:
+            callback(msg="OCR finished ({:.2f}s)".format(timer() - start))
+        return layouts, tables
+
+    def __call__(self, fnm, need_image=True, zoomin=3, return_html=False, page_window=None, text_layer=False,
+                 rec_queue_size=0, raster_processes=0, rasterizer="pdfplumber", checkpoint_dir=None, ocr_snapshot=None,
+                 ocr_processes=0, pipeline_queue_size=0, layout_first=False, page_pyramid=False,
+                 page_orientation=False):
+        """
+        ocr_snapshot: path of an OCR snapshot. If it exists, OCR is replaced by
+        loading it; otherwise the snapshot is saved there after OCR.
+        pipeline_queue_size: if set, layout and table structure recognition run
+        alongside OCR, fed through a queue of that many pages (see `_images_pipelined`).
+        layout_first: recognize the layouts before OCR, and only the text of the boxes
+        which are kept by them (see `_images_layout_first`). Takes over from pipelining.
+        page_pyramid, page_orientation: see `__images__`.
+        """
+        layouts, tables = self._ocr_stage(fnm, zoomin, ocr_snapshot=ocr_snapshot,
+                                          pipeline_queue_size=pipeline_queue_size, layout_first=layout_first,
+                                          page_window=page_window, text_layer=text_layer,
+                                          rec_queue_size=rec_queue_size, raster_processes=raster_processes,
+                                          rasterizer=rasterizer, checkpoint_dir=checkpoint_dir,
+                                          ocr_processes=ocr_processes, page_pyramid=page_pyramid,
+                                          page_orientation=page_orientation)
+        self._layouts_rec(zoomin, layouts=layouts)
+        self._table_transformer_job(zoomin, tables=tables)
         self._text_merge()
         self._concat_downward()
         self._filter_forpages()
         tbls = self._extract_table_figure(
             need_image, zoomin, return_html, False)
+        if self.checkpoint:
+            self.checkpoint.clear()
         return self.__filterout_scraps(deepcopy(self.boxes), zoomin), tbls
 
+    def _predict_layouts(self, pns, scale=1.0, batch_size=16):
+        """
+        Raw layouts of the pages `pns`, recognized on copies of the page images
+        downscaled by `scale`, or on their levels of the page pyramid, with the
+        boxes mapped back onto the page images.
+        """
+        if scale == 1 and not self.page_pyramid:
+            return self.layouter.predict_layouts([self.page_images[pn] for pn in pns], batch_size=batch_size)
+        imgs, ratios = [], []
+        for pn in pns:
+            if scale == 1:
+                small, ratio = self._page_level(pn, self.layouter.input_side())
+            else:
+                img = self.page_images[pn]
+                small = img.resize((max(1, int(img.size[0] * scale)), max(1, int(img.size[1] * scale))))
+                ratio = (img.size[0] / small.size[0], img.size[1] / small.size[1])
+            imgs.append(small)
+            ratios.append(ratio)
+        lts = self.layouter.predict_layouts(imgs, batch_size=batch_size)
+        for pn, page, (rx, ry) in zip(pns, lts, ratios):
+            w, h = self._page_size(pn)
+            for b in page:
+                x0, y0, x1, y1 = b["bbox"][:4]
+                b["bbox"] = [min(x0 * rx, w), min(y0 * ry, h), min(x1 * rx, w), min(y1 * ry, h)]
+        return lts
+
+    def _layouts_on_demand(self, page_window=None, scale=1.0):
+        """
+        A function returning the raw layouts of a page, recognized the first time
+        they are asked for together with those of the following pages.
+        """
+        layouts = {}
+        lock = threading.Lock()
+        batch_size = min(16, max(1, int(page_window))) if page_window else 16
+
+        def layout_of(pn):
+            with lock:
+                if pn not in layouts:
+                    pns = list(range(pn, min(pn + batch_size, len(self.page_images))))
+                    layouts.update(zip(pns, self._predict_layouts(pns, scale, batch_size)))
+                return layouts[pn]
+
+        return layout_of
+
+    def _images_layout_first(self, fnm, zoomin=3, page_from=0, page_to=299, callback=None, **kwargs):
+        """
+        `__images__`, with the layouts of every page recognized before its OCR, so
+        that the detected boxes which `_layouts_rec` would drop (headers, footers and
+        references) or bury in figures and equations are never recognized. Text
+        from the PDF is kept as usual. Unlike after full OCR, text repeated in the
+        dropped headers and footers of scanned pages is not known, so it is not
+        removed from elsewhere in the document. Returns the raw layouts of the
+        pages, to be passed to `_layouts_rec`.
+        """
+        layout_of = self._layouts_on_demand(kwargs.get("page_window"))
+
+        def skip_rec(pn, img, bxs):
+            return self.layouter.unkept(bxs, self.layouter.page_layout(bxs, layout_of(pn), zoomin, pn),
+                                        img.size[1], zoomin)
+
+        self.__images__(fnm, zoomin, page_from, page_to, callback, skip_rec=skip_rec, **kwargs)
+        return [layout_of(pn) for pn in range(len(self.page_images))]
+
+    def extract_tables(self, fnm, need_image=False, zoomin=3, return_html=True, page_from=0, page_to=299,
+                       callback=None, page_window=None, rasterizer="pdfplumber", layout_scale=1.0):
+        """
+        Only the tables of the document: layouts are recognized first, on the bare
+        page images, and only the table regions (with their captions) are OCRed and
+        go through table structure recognition. Text elsewhere is never recognized,
+        so pages without tables cost just rasterization and layout recognition.
+        layout_scale: the page images are downscaled by it for layout recognition.
+        Returns the tables with their positions, as `_extract_table_figure` does.
+        """
+        layout_of = self._layouts_on_demand(page_window, layout_scale)
+
+        def regions(pn, img):
+            lts = self.layouter.page_layout([], layout_of(pn), zoomin, pn)
+            return [(lt["x0"] - 10, lt["top"] - 10, lt["x1"] + 10, lt["bottom"] + 10)
+                    for lt in lts if lt["type"] in ("table", "table caption")]
+
+        self.__images__(fnm, zoomin, page_from, page_to, callback, page_window=page_window,
+                        rasterizer=rasterizer, ocr_regions=regions)
+        self._layouts_rec(zoomin, layouts=[layout_of(pn) for pn in range(len(self.page_images))])
+        self._table_transformer_job(zoomin)
+        self._text_merge()
+        tbls, _ = self._extract_table_figure(need_image, zoomin, return_html, True, separate_tables_figures=True)
+        return tbls
+
     def remove_tag(self, txt):
         return re.sub(r"@@[\t0-9.-]+?##", "", txt)
 
@@ -1159,38 +1940,38 @@ class RAGFlowPdfParser:
         poss.insert(0, ([pos[0][0]], pos[1], pos[2], max(
             0, pos[3] - 120), max(pos[3] - GAP, 0)))
         pos = poss[-1]
-        poss.append(([pos[0][-1]], pos[1], pos[2], min(self.page_images[pos[0][-1]].size[1] / ZM, pos[4] + GAP),
-                     min(self.page_images[pos[0][-1]].size[1] / ZM, pos[4] + 120)))
+        poss.append(([pos[0][-1]], pos[1], pos[2], min(self._page_size(pos[0][-1])[1] / ZM, pos[4] + GAP),
+                     min(self._page_size(pos[0][-1])[1] / ZM, pos[4] + 120)))
 
         positions = []
         for ii, (pns, left, right, top, bottom) in enumerate(poss):
             right = left + max_width
             bottom *= ZM
             for pn in pns[1:]:
-                bottom += self.page_images[pn - 1].size[1]
+                bottom += self._page_size(pn - 1)[1]
             imgs.append(
                 self.page_images[pns[0]].crop((left * ZM, top * ZM,
                                                right *
                                                ZM, min(
-                                                   bottom, self.page_images[pns[0]].size[1])
+                                                   bottom, self._page_size(pns[0])[1])
                                                ))
             )
             if 0 < ii < len(poss) - 1:
                 positions.append((pns[0] + self.page_from, left, right, top, min(
-                    bottom, self.page_images[pns[0]].size[1]) / ZM))
-            bottom -= self.page_images[pns[0]].size[1]
+                    bottom, self._page_size(pns[0])[1]) / ZM))
+            bottom -= self._page_size(pns[0])[1]
             for pn in pns[1:]:
                 imgs.append(
                     self.page_images[pn].crop((left * ZM, 0,
                                                right * ZM,
                                                min(bottom,
-                                                   self.page_images[pn].size[1])
+                                                   self._page_size(pn)[1])
                                                ))
                 )
                 if 0 < ii < len(poss) - 1:
                     positions.append((pn + self.page_from, left, right, 0, min(
-                        bottom, self.page_images[pn].size[1]) / ZM))
-                bottom -= self.page_images[pn].size[1]
+                        bottom, self._page_size(pn)[1]) / ZM))
+                bottom -= self._page_size(pn)[1]
 
         if not imgs:
             if need_position:
@@ -1224,13 +2005,13 @@ class RAGFlowPdfParser:
         top = bx["top"] - self.page_cum_height[pn - 1]
         bott = bx["bottom"] - self.page_cum_height[pn - 1]
         poss.append((pn, bx["x0"], bx["x1"], top, min(
-            bott, self.page_images[pn - 1].size[1] / ZM)))
-        while bott * ZM > self.page_images[pn - 1].size[1]:
-            bott -= self.page_images[pn - 1].size[1] / ZM
+            bott, self._page_size(pn - 1)[1] / ZM)))
+        while bott * ZM > self._page_size(pn - 1)[1]:
+            bott -= self._page_size(pn - 1)[1] / ZM
             top = 0
             pn += 1
             poss.append((pn, bx["x0"], bx["x1"], top, min(
-                bott, self.page_images[pn - 1].size[1] / ZM)))
+                bott, self._page_size(pn - 1)[1] / ZM)))
         return poss
 
 
@@ -0,0 +1,185 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import multiprocessing
+import os
+import sys
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pdfplumber
+import pymupdf
+from PIL import Image
+
+# pdfium, which pdfplumber renders with, is not thread safe: renders inside one
+# process are serialized by this lock. Text extraction doesn't need it.
+LOCK_KEY_pdfplumber = "global_shared_lock_pdfplumber"
+if LOCK_KEY_pdfplumber not in sys.modules:
+    sys.modules[LOCK_KEY_pdfplumber] = threading.Lock()
+
+# neither is MuPDF
+LOCK_KEY_pymupdf = "global_shared_lock_pymupdf"
+if LOCK_KEY_pymupdf not in sys.modules:
+    sys.modules[LOCK_KEY_pymupdf] = threading.Lock()
+
+
+def as_pil_image(img):
+    """A page rendered by a Rasterizer as an RGB PIL image."""
+    return img if isinstance(img, Image.Image) else Image.fromarray(img)
+
+
+def as_array(img):
+    """A page rendered by a Rasterizer as an RGB array of shape (height, width, 3)."""
+    return img if isinstance(img, np.ndarray) else np.asarray(img)
+
+
+class Rasterizer(ABC):
+    """
+    Renders the pages of one document, `zoomin` pixels per PDF point, as RGB PIL
+    images or RGB arrays of shape (height, width, 3), whichever the backend holds,
+    so that callers convert at most once (see `as_pil_image` and `as_array`).
+    """
+    name = ""
+
+    def __init__(self, fnm):
+        self.fnm = fnm
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    @abstractmethod
+    def render(self, i, zoomin=3):
+        ...
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class PdfplumberRasterizer(Rasterizer):
+    name = "pdfplumber"
+
+    def __init__(self, fnm, pdf=None):
+        """pdf: an open pdfplumber handle of `fnm` to render with, left open by `close`."""
+        super().__init__(fnm)
+        self.owns_pdf = pdf is None
+        if pdf is None:
+            pdf = pdfplumber.open(fnm) if isinstance(fnm, str) else pdfplumber.open(BytesIO(fnm))
+        self.pdf = pdf
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def render(self, i, zoomin=3):
+        with sys.modules[LOCK_KEY_pdfplumber]:
+            img = self.pdf.pages[i].to_image(resolution=72 * zoomin, antialias=True).annotated
+        return img if img.mode == "RGB" else img.convert("RGB")
+
+    def close(self):
+        if self.owns_pdf:
+            self.pdf.close()
+
+
+class PyMuPDFRasterizer(Rasterizer):
+    name = "pymupdf"
+
+    def __init__(self, fnm):
+        super().__init__(fnm)
+        # MuPDF isn't thread safe, the page count is kept so that len() doesn't touch the document
+        with sys.modules[LOCK_KEY_pymupdf]:
+            self.doc = pymupdf.open(fnm) if isinstance(fnm, str) else pymupdf.open(stream=fnm, filetype="pdf")
+            self.page_count = len(self.doc)
+
+    def __len__(self):
+        return self.page_count
+
+    def render(self, i, zoomin=3):
+        with sys.modules[LOCK_KEY_pymupdf]:
+            pix = self.doc[i].get_pixmap(matrix=pymupdf.Matrix(zoomin, zoomin), alpha=False)
+        # the pixmap samples are used as is, without going through PIL
+        return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)[:, :, :3]
+
+    def close(self):
+        with sys.modules[LOCK_KEY_pymupdf]:
+            self.doc.close()
+
+
+RASTERIZERS = {r.name: r for r in [PdfplumberRasterizer, PyMuPDFRasterizer]}
+
+
+def get_rasterizer(name, fnm, pdf=None):
+    """pdf: an open pdfplumber handle of `fnm`, which the pdfplumber backend renders with instead of opening its own."""
+    if name not in RASTERIZERS:
+        raise ValueError(f"Unknown rasterizer: {name}, should be one of {list(RASTERIZERS.keys())}")
+    if pdf is not None and name == PdfplumberRasterizer.name:
+        return PdfplumberRasterizer(fnm, pdf)
+    return RASTERIZERS[name](fnm)
+
+
+def _render_pages_worker(fnm, zoomin, page_indices, rasterizer):
+    with get_rasterizer(rasterizer, fnm) as r:
+        return [r.render(i, zoomin) for i in page_indices]
+
+
+class RasterizerPool:
+    """
+    Rasterizes pages in worker processes, so documents parsed from different
+    threads don't wait for each other's renders. The pages of a document are
+    split into contiguous chunks which are rendered in parallel.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = max(1, int(processes or os.cpu_count() or 1))
+        # spawn: forking a process holding ONNX sessions and threads is unsafe
+        self.executor = ProcessPoolExecutor(max_workers=self.processes,
+                                            mp_context=multiprocessing.get_context("spawn"))
+
+    def render(self, fnm, zoomin=3, page_indices=None, rasterizer="pdfplumber"):
+        if page_indices is None:
+            with get_rasterizer(rasterizer, fnm) as r:
+                page_indices = range(len(r))
+        page_indices = list(page_indices)
+        if not page_indices:
+            return []
+        n = min(self.processes, len(page_indices))
+        step = (len(page_indices) + n - 1) // n
+        futures = [self.executor.submit(_render_pages_worker, fnm, zoomin, page_indices[i:i + step], rasterizer)
+                   for i in range(0, len(page_indices), step)]
+        return [img for f in futures for img in f.result()]
+
+    def close(self):
+        self.executor.shutdown()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_rasterizer_pool(processes):
+    """The process wide pool with `processes` workers, created on first use."""
+    with _pools_lock:
+        if processes not in _pools:
+            _pools[processes] = RasterizerPool(processes)
+        return _pools[processes]
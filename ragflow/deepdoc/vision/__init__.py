@@ -22,6 +22,7 @@ from .ocr import OCR
 from .recognizer import Recognizer
 from .layout_recognizer import LayoutRecognizer4YOLOv10 as LayoutRecognizer
 from .table_structure_recognizer import TableStructureRecognizer
+from .session_settings import OnnxSettings, SessionSettings
 
 
 LOCK_KEY_pdfplumber = "global_shared_lock_pdfplumber"
@@ -33,4 +34,6 @@ __all__ = [
     "Recognizer", 
     "LayoutRecognizer",
     "TableStructureRecognizer",
+    "OnnxSettings",
+    "SessionSettings",
 ]
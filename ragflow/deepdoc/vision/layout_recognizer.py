@@ -26,6 +26,7 @@ from huggingface_hub import snapshot_download
 from ragflow.api.utils.file_utils import get_project_base_directory
 from ragflow.deepdoc.vision import Recognizer
 from ragflow.deepdoc.vision.operators import nms
+from ragflow.deepdoc.vision.session_settings import OnnxSettings
 
 
 class LayoutRecognizer(Recognizer):
@@ -42,23 +43,71 @@ class LayoutRecognizer(Recognizer):
         "Reference",
         "Equation",
     ]
+    # boxes are tagged with the first of these layout types they overlap
+    tag_order = ["footer", "header", "reference", "figure caption",
+                 "table caption", "title", "table", "text", "figure", "equation"]
 
-    def __init__(self, domain):
+    def __init__(self, domain, settings: OnnxSettings | None = None):
+        settings = (settings or OnnxSettings()).layout
         try:
             model_dir = os.path.join(
                 get_project_base_directory(),
                 "rag/res/deepdoc")
-            super().__init__(self.labels, domain, model_dir)
+            super().__init__(self.labels, domain, model_dir, settings)
         except Exception:
             model_dir = snapshot_download(repo_id="InfiniFlow/deepdoc",
                                           local_dir=os.path.join(get_project_base_directory(), "rag/res/deepdoc"),
                                           local_dir_use_symlinks=False)
-            super().__init__(self.labels, domain, model_dir)
+            super().__init__(self.labels, domain, model_dir, settings)
 
         self.garbage_layouts = ["footer", "header", "reference"]
         self.client = None
 
-    def __call__(self, image_list, ocr_res, scale_factor=3, thr=0.2, batch_size=16, drop=True):
+    def predict_layouts(self, image_list, thr=0.2, batch_size=16):
+        """Raw layouts of the pages, before any OCR box is tagged with them."""
+        if self.client:
+            return self.client.predict(image_list)
+        return super().__call__(image_list, thr, batch_size)
+
+    def page_layout(self, bxs, lts, scale_factor=3, pn=0):
+        """The cleaned up layouts of a page, in page coordinates, from its raw layouts and OCR boxes."""
+        lts = [{"type": b["type"],
+                "score": float(b["score"]),
+                "x0": b["bbox"][0] / scale_factor, "x1": b["bbox"][2] / scale_factor,
+                "top": b["bbox"][1] / scale_factor, "bottom": b["bbox"][-1] / scale_factor,
+                "page_number": pn,
+                } for b in lts if float(b["score"]) >= 0.4 or b["type"] not in self.garbage_layouts]
+        lts = self.sort_Y_firstly(lts, np.mean(
+            [lt["bottom"] - lt["top"] for lt in lts]) / 2)
+        return self.layouts_cleanup(bxs, lts)
+
+    def unkept(self, bxs, lts, page_height, scale_factor=3, drop=True):
+        """
+        Flags the OCR boxes of a page which tagging with its layouts `lts` (see
+        `page_layout`) would drop, or put inside a figure or an equation, so that
+        they can be left out before recognition. page_height is in pixels.
+        """
+        lts = {ty: [lt for lt in lts if lt["type"] == ty] for ty in self.tag_order}
+        flags = []
+        for b in bxs:
+            flag = False
+            for ty in self.tag_order:
+                if self.find_overlapped_with_threashold(b, lts[ty], thr=0.4) is None:
+                    continue
+                if ty in ["figure", "equation"]:
+                    flag = True
+                elif drop and ty in self.garbage_layouts:
+                    flag = not (ty == "footer" and b["bottom"] < page_height * 0.9 / scale_factor
+                                or ty == "header" and b["top"] > page_height * 0.1 / scale_factor)
+                break
+            flags.append(flag)
+        return flags
+
+    def __call__(self, image_list, ocr_res, scale_factor=3, thr=0.2, batch_size=16, drop=True, layouts=None):
+        """
+        layouts: raw layouts of the pages as returned by `predict_layouts`, when
+        they are known already, e.g. from a checkpoint.
+        """
         def __is_garbage(b):
             patt = [r"^•+$", "^[0-9]{1,2} / ?[0-9]{1,2}$",
                     r"^[0-9]{1,2} of [0-9]{1,2}$", "^http://[^ ]{12,}",
@@ -66,10 +115,8 @@ class LayoutRecognizer(Recognizer):
                     ]
             return any([re.search(p, b["text"]) for p in patt])
 
-        if self.client:
-            layouts = self.client.predict(image_list)
-        else:
-            layouts = super().__call__(image_list, thr, batch_size)
+        if layouts is None:
+            layouts = self.predict_layouts(image_list, thr, batch_size)
         # save_results(image_list, layouts, self.labels, output_dir='output/', threshold=0.7)
         assert len(image_list) == len(ocr_res)
         # Tag layout type
@@ -79,20 +126,13 @@ class LayoutRecognizer(Recognizer):
         page_layout = []
         for pn, lts in enumerate(layouts):
             bxs = ocr_res[pn]
-            lts = [{"type": b["type"],
-                    "score": float(b["score"]),
-                    "x0": b["bbox"][0] / scale_factor, "x1": b["bbox"][2] / scale_factor,
-                    "top": b["bbox"][1] / scale_factor, "bottom": b["bbox"][-1] / scale_factor,
-                    "page_number": pn,
-                    } for b in lts if float(b["score"]) >= 0.4 or b["type"] not in self.garbage_layouts]
-            lts = self.sort_Y_firstly(lts, np.mean(
-                [lt["bottom"] - lt["top"] for lt in lts]) / 2)
-            lts = self.layouts_cleanup(bxs, lts)
+            page_height = image_list.size(pn)[1] if hasattr(image_list, "size") else image_list[pn].size[1]
+            lts = self.page_layout(bxs, lts, scale_factor, pn)
             page_layout.append(lts)
 
             # Tag layout type, layouts are ready
             def findLayout(ty):
-                nonlocal bxs, lts, self
+                nonlocal bxs, lts, self, page_height
                 lts_ = [lt for lt in lts if lt["type"] == ty]
                 i = 0
                 while i < len(bxs):
@@ -112,9 +152,9 @@ class LayoutRecognizer(Recognizer):
                     lts_[ii]["visited"] = True
                     keep_feats = [
                         lts_[
-                            ii]["type"] == "footer" and bxs[i]["bottom"] < image_list[pn].size[1] * 0.9 / scale_factor,
+                            ii]["type"] == "footer" and bxs[i]["bottom"] < page_height * 0.9 / scale_factor,
                         lts_[
-                            ii]["type"] == "header" and bxs[i]["top"] > image_list[pn].size[1] * 0.1 / scale_factor,
+                            ii]["type"] == "header" and bxs[i]["top"] > page_height * 0.1 / scale_factor,
                     ]
                     if drop and lts_[
                             ii]["type"] in self.garbage_layouts and not any(keep_feats):
@@ -129,8 +169,7 @@ class LayoutRecognizer(Recognizer):
                         ii]["type"] != "equation" else "figure"
                     i += 1
 
-            for lt in ["footer", "header", "reference", "figure caption",
-                       "table caption", "title", "table", "text", "figure", "equation"]:
+            for lt in self.tag_order:
                 findLayout(lt)
 
             # add box to figure layouts which has not text box
@@ -177,9 +216,9 @@ class LayoutRecognizer4YOLOv10(LayoutRecognizer):
         "Figure caption",
     ]
 
-    def __init__(self, domain):
+    def __init__(self, domain, settings: OnnxSettings | None = None):
         domain = "layout"
-        super().__init__(domain)
+        super().__init__(domain, settings)
         self.auto = False
         self.scaleFill = False
         self.scaleup = True
@@ -16,6 +16,8 @@
 
 import logging
 import copy
+import hashlib
+import tempfile
 import time
 import os
 
@@ -31,6 +33,7 @@ import cv2
 import onnxruntime as ort
 
 from .postprocess import build_post_process
+from .session_settings import GRAPH_OPTIMIZATION_LEVELS, OnnxSettings, SessionSettings
 
 loaded_models = {}
 
@@ -67,9 +70,69 @@ def create_operators(op_param_list, global_config=None):
     return ops
 
 
-def load_model(model_dir, nm, device_id: int | None = None):
-    model_file_path = os.path.join(model_dir, nm + ".onnx")
+def optimized_model_path(model_file_path, settings: SessionSettings, provider):
+    """
+    Where the graph of `model_file_path` optimized for `settings` and `provider`
+    is kept, next to the model and keyed by everything the optimized graph depends on.
+    """
+    level = settings.serialized_optimization_level()
+    tag = hashlib.sha1(f"{ort.__version__}-{provider}-{level}".encode("utf-8")).hexdigest()[:12]
+    return f"{os.path.splitext(model_file_path)[0]}.{tag}.opt.onnx"
+
+
+def create_session(model_file_path, settings: SessionSettings, provider, provider_options=None):
+    """
+    An InferenceSession of the model. Unless disabled by the settings, the graph ORT
+    optimizes on the first load is saved next to the model and later sessions are
+    created from it, so they skip graph optimization. Where the optimized graph
+    can't be read or written, the session is built from the original model.
+    """
+    def session(path, options):
+        return ort.InferenceSession(path, options, providers=[provider],
+                                    provider_options=[provider_options] if provider_options else None)
+
+    if not settings.cache_optimized_model or settings.graph_optimization_level == "disable":
+        return session(model_file_path, settings.session_options())
+
+    opt_path = optimized_model_path(model_file_path, settings, provider)
+    if os.path.exists(opt_path):
+        try:
+            return session(opt_path, settings.session_options())
+        except Exception:
+            logging.exception(f"create_session failed to load the optimized graph {opt_path}, dropping it")
+            try:
+                os.remove(opt_path)
+            except OSError:
+                pass
+
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(opt_path), suffix=".tmp")
+        os.close(fd)
+    except OSError as e:
+        logging.info(f"create_session can't save the optimized graph of {model_file_path}: {e}")
+        return session(model_file_path, settings.session_options())
+    try:
+        options = settings.session_options()
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[settings.serialized_optimization_level()]
+        options.optimized_model_filepath = tmp
+        sess = session(model_file_path, options)
+        if settings.graph_optimization_level != settings.serialized_optimization_level():
+            # layout optimizations are applied on top, they depend on the CPU
+            sess = session(tmp, settings.session_options())
+        os.replace(tmp, opt_path)
+        logging.info(f"create_session saved the optimized graph of {model_file_path} to {opt_path}")
+        return sess
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_model(model_dir, nm, device_id: int | None = None, settings: SessionSettings | None = None):
+    settings = settings or SessionSettings()
+    model_file_path = os.path.join(model_dir, settings.model_file_name(nm))
     model_cached_tag = model_file_path + str(device_id) if device_id is not None else model_file_path
+    # sessions with other options are other sessions
+    model_cached_tag += "@" + settings.key()
 
     global loaded_models
     loaded_model = loaded_models.get(model_cached_tag)
@@ -78,6 +141,9 @@ def load_model(model_dir, nm, device_id: int | None = None):
         return loaded_model
 
     if not os.path.exists(model_file_path):
+        if settings.precision != "fp32":
+            raise ValueError(f"not find model file path {model_file_path}, "
+                             f"run `python -m ragflow.deepdoc.vision.quantize` to make the {settings.precision} models")
         raise ValueError("not find model file path {}".format(
             model_file_path))
 
@@ -90,12 +156,6 @@ def load_model(model_dir, nm, device_id: int | None = None):
             return False
         return False
 
-    options = ort.SessionOptions()
-    options.enable_cpu_mem_arena = False
-    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
-    options.intra_op_num_threads = 2
-    options.inter_op_num_threads = 2
-
     # https://github.com/microsoft/onnxruntime/issues/9509#issuecomment-951546580
     # Shrink GPU memory after execution
     run_options = ort.RunOptions()
@@ -105,19 +165,11 @@ def load_model(model_dir, nm, device_id: int | None = None):
             "gpu_mem_limit": 512 * 1024 * 1024, # Limit gpu memory
             "arena_extend_strategy": "kNextPowerOfTwo",  # gpu memory allocation strategy
         }
-        sess = ort.InferenceSession(
-            model_file_path,
-            options=options,
-            providers=['CUDAExecutionProvider'],
-            provider_options=[cuda_provider_options]
-            )
+        sess = create_session(model_file_path, settings, 'CUDAExecutionProvider', cuda_provider_options)
         run_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", "gpu:" + str(device_id))
         logging.info(f"load_model {model_file_path} uses GPU")
     else:
-        sess = ort.InferenceSession(
-            model_file_path,
-            options=options,
-            providers=['CPUExecutionProvider'])
+        sess = create_session(model_file_path, settings, 'CPUExecutionProvider')
         run_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", "cpu")
         logging.info(f"load_model {model_file_path} uses CPU")
     loaded_model = (sess, run_options)
@@ -126,28 +178,58 @@ def load_model(model_dir, nm, device_id: int | None = None):
 
 
 class TextRecognizer:
-    def __init__(self, model_dir, device_id: int | None = None):
+    def __init__(self, model_dir, device_id: int | None = None, settings: SessionSettings | None = None):
         self.rec_image_shape = [int(v) for v in "3, 48, 320".split(",")]
         self.rec_batch_num = 16
+        self.max_batch_pixels = (settings or SessionSettings()).max_batch_pixels
         postprocess_params = {
             'name': 'CTCLabelDecode',
             "character_dict_path": os.path.join(model_dir, "ocr.res"),
             "use_space_char": True
         }
         self.postprocess_op = build_post_process(postprocess_params)
-        self.predictor, self.run_options = load_model(model_dir, 'rec', device_id)
+        self.predictor, self.run_options = load_model(model_dir, 'rec', device_id, settings)
         self.input_tensor = self.predictor.get_inputs()[0]
 
-    def resize_norm_img(self, img, max_wh_ratio):
+    def padded_width(self, max_wh_ratio):
+        """The width crops are padded to in a batch of this largest aspect ratio."""
         imgC, imgH, imgW = self.rec_image_shape
-
-        assert imgC == img.shape[2]
         imgW = int((imgH * max_wh_ratio))
         w = self.input_tensor.shape[3:][0]
         if isinstance(w, str):
             pass
         elif w is not None and w > 0:
             imgW = w
+        return imgW
+
+    def batch_bounds(self, wh_ratios):
+        """
+        (begin, end) of the batches of crops of increasing aspect ratios `wh_ratios`.
+        Without a pixel budget, fixed batches of rec_batch_num crops. Otherwise a
+        batch takes crops up to twice the padded width of its first one, so that
+        short lines aren't padded to the width of a long one, and as long as its
+        padded area stays within max_batch_pixels.
+        """
+        n = len(wh_ratios)
+        if not self.max_batch_pixels:
+            return [(beg, min(n, beg + self.rec_batch_num)) for beg in range(0, n, self.rec_batch_num)]
+        imgC, imgH, imgW = self.rec_image_shape[:3]
+        widths = [self.padded_width(max(imgW / imgH, r)) for r in wh_ratios]
+        bounds, beg = [], 0
+        while beg < n:
+            end = beg + 1
+            while end < n and widths[end] <= 2 * widths[beg] \
+                    and (end + 1 - beg) * imgH * widths[end] <= self.max_batch_pixels:
+                end += 1
+            bounds.append((beg, end))
+            beg = end
+        return bounds
+
+    def resize_norm_img(self, img, max_wh_ratio):
+        imgC, imgH, imgW = self.rec_image_shape
+
+        assert imgC == img.shape[2]
+        imgW = self.padded_width(max_wh_ratio)
         h, w = img.shape[:2]
         ratio = w / float(h)
         if math.ceil(imgH * ratio) > imgW:
@@ -357,11 +439,9 @@ class TextRecognizer:
         # Sorting can speed up the recognition process
         indices = np.argsort(np.array(width_list))
         rec_res = [['', 0.0]] * img_num
-        batch_num = self.rec_batch_num
         st = time.time()
 
-        for beg_img_no in range(0, img_num, batch_num):
-            end_img_no = min(img_num, beg_img_no + batch_num)
+        for beg_img_no, end_img_no in self.batch_bounds([width_list[i] for i in indices]):
             norm_img_batch = []
             imgC, imgH, imgW = self.rec_image_shape[:3]
             max_wh_ratio = imgW / imgH
@@ -397,7 +477,7 @@ class TextRecognizer:
 
 
 class TextDetector:
-    def __init__(self, model_dir, device_id: int | None = None):
+    def __init__(self, model_dir, device_id: int | None = None, settings: SessionSettings | None = None):
         pre_process_list = [{
             'DetResizeForTest': {
                 'limit_side_len': 960,
@@ -417,11 +497,11 @@ class TextDetector:
                 'keep_keys': ['image', 'shape']
             }
         }]
-        postprocess_params = {"name": "DBPostProcess", "thresh": 0.3, "box_thresh": 0.5, "max_candidates": 1000,
+        postprocess_params = {"name": "FastDBPostProcess", "thresh": 0.3, "box_thresh": 0.5, "max_candidates": 1000,
                               "unclip_ratio": 1.5, "use_dilation": False, "score_mode": "fast", "box_type": "quad"}
 
         self.postprocess_op = build_post_process(postprocess_params)
-        self.predictor, self.run_options = load_model(model_dir, 'det', device_id)
+        self.predictor, self.run_options = load_model(model_dir, 'det', device_id, settings)
         self.input_tensor = self.predictor.get_inputs()[0]
 
         img_h, img_w = self.input_tensor.shape[2:]
@@ -435,6 +515,15 @@ class TextDetector:
             }
         self.preprocess_op = create_operators(pre_process_list)
 
+    def input_side(self):
+        """The longer side images are resized to before detection, None if they keep their size."""
+        op = self.preprocess_op[0]
+        if op.resize_type == 1:
+            return max(op.image_shape)
+        if op.resize_type == 2:
+            return op.resize_long
+        return op.limit_side_len if op.limit_type in ["max", "resize_long"] else None
+
     def order_points_clockwise(self, pts):
         rect = np.zeros((4, 2), dtype="float32")
         s = pts.sum(axis=1)
@@ -453,20 +542,37 @@ class TextDetector:
         return points
 
     def filter_tag_det_res(self, dt_boxes, image_shape):
+        """
+        The boxes ordered clockwise (`order_points_clockwise`), clipped to the
+        image (`clip_det_res`) and without the ones 3 pixels wide or high at most,
+        all of them at once.
+        """
         img_height, img_width = image_shape[0:2]
-        dt_boxes_new = []
-        for box in dt_boxes:
-            if isinstance(box, list):
-                box = np.array(box)
-            box = self.order_points_clockwise(box)
-            box = self.clip_det_res(box, img_height, img_width)
-            rect_width = int(np.linalg.norm(box[0] - box[1]))
-            rect_height = int(np.linalg.norm(box[0] - box[3]))
-            if rect_width <= 3 or rect_height <= 3:
-                continue
-            dt_boxes_new.append(box)
-        dt_boxes = np.array(dt_boxes_new)
-        return dt_boxes
+        boxes = np.asarray(dt_boxes)
+        if not len(boxes):
+            return np.array([])
+        rect = np.zeros(boxes.shape, dtype="float32")
+        s = boxes.sum(axis=2)
+        i0, i2 = np.argmin(s, axis=1), np.argmax(s, axis=1)
+        rows = np.arange(len(boxes))
+        rect[:, 0], rect[:, 2] = boxes[rows, i0], boxes[rows, i2]
+        # the two other points, by y - x
+        others = np.arange(4)[None, :]
+        others = boxes[(others != i0[:, None]) & (others != i2[:, None])]
+        degenerate = i0 == i2
+        if not degenerate.any():
+            others = others.reshape(-1, 2, 2)
+            diff = others[:, :, 1] - others[:, :, 0]
+            rect[:, 1] = others[rows, np.argmin(diff, axis=1)]
+            rect[:, 3] = others[rows, np.argmax(diff, axis=1)]
+        else:
+            rect = np.array([self.order_points_clockwise(box) for box in boxes])
+        rect[:, :, 0] = np.trunc(np.clip(rect[:, :, 0], 0, img_width - 1))
+        rect[:, :, 1] = np.trunc(np.clip(rect[:, :, 1], 0, img_height - 1))
+        widths = np.sqrt(np.square(rect[:, 0] - rect[:, 1]).sum(axis=1)).astype(int)
+        heights = np.sqrt(np.square(rect[:, 0] - rect[:, 3]).sum(axis=1)).astype(int)
+        rect = rect[(widths > 3) & (heights > 3)]
+        return rect if len(rect) else np.array([])
 
     def filter_tag_det_res_only_clip(self, dt_boxes, image_shape):
         img_height, img_width = image_shape[0:2]
@@ -510,7 +616,7 @@ class TextDetector:
 
 
 class OCR:
-    def __init__(self, model_dir=None):
+    def __init__(self, model_dir=None, settings: OnnxSettings | None = None):
         """
         If you have trouble downloading HuggingFace models, -_^ this might help!!
 
@@ -521,7 +627,9 @@ class OCR:
         Good luck
         ^_-
 
+        settings: session settings of the detection and recognition models.
         """
+        settings = settings or OnnxSettings()
         if not model_dir:
             try:
                 model_dir = os.path.join(
@@ -533,11 +641,11 @@ class OCR:
                     self.text_detector = []
                     self.text_recognizer = []
                     for device_id in range(PARALLEL_DEVICES):
-                        self.text_detector.append(TextDetector(model_dir, device_id))
-                        self.text_recognizer.append(TextRecognizer(model_dir, device_id))
+                        self.text_detector.append(TextDetector(model_dir, device_id, settings.det))
+                        self.text_recognizer.append(TextRecognizer(model_dir, device_id, settings.rec))
                 else:
-                    self.text_detector = [TextDetector(model_dir)]
-                    self.text_recognizer = [TextRecognizer(model_dir)]
+                    self.text_detector = [TextDetector(model_dir, settings=settings.det)]
+                    self.text_recognizer = [TextRecognizer(model_dir, settings=settings.rec)]
 
             except Exception:
                 model_dir = snapshot_download(repo_id="InfiniFlow/deepdoc",
@@ -548,16 +656,36 @@ class OCR:
                     self.text_detector = []
                     self.text_recognizer = []
                     for device_id in range(PARALLEL_DEVICES):
-                        self.text_detector.append(TextDetector(model_dir, device_id))
-                        self.text_recognizer.append(TextRecognizer(model_dir, device_id))
+                        self.text_detector.append(TextDetector(model_dir, device_id, settings.det))
+                        self.text_recognizer.append(TextRecognizer(model_dir, device_id, settings.rec))
                 else:
-                    self.text_detector = [TextDetector(model_dir)]
-                    self.text_recognizer = [TextRecognizer(model_dir)]
+                    self.text_detector = [TextDetector(model_dir, settings=settings.det)]
+                    self.text_recognizer = [TextRecognizer(model_dir, settings=settings.rec)]
 
         self.drop_score = 0.5
         self.crop_image_res_index = 0
 
-    def get_rotate_crop_image(self, img, points):
+    @staticmethod
+    def axis_aligned_crop(img, points, width, height):
+        """
+        The crop of `points` as a view of `img`, when they are the corners of an
+        upright rectangle on whole pixels inside the image, clockwise from the top
+        left one: warping it would only copy those pixels. None otherwise.
+        """
+        corners = np.rint(points)
+        if np.abs(points - corners).max() > 1e-3:
+            return None
+        (left, top), (right, _), (_, bottom), _ = corners
+        if not (corners[0, 1] == corners[1, 1] and corners[2, 1] == corners[3, 1]
+                and corners[0, 0] == corners[3, 0] and corners[1, 0] == corners[2, 0]):
+            return None
+        if width <= 0 or height <= 0 or right - left != width or bottom - top != height:
+            return None
+        if left < 0 or top < 0 or right > img.shape[1] or bottom > img.shape[0]:
+            return None
+        return img[int(top):int(bottom), int(left):int(right)]
+
+    def get_rotate_crop_image(self, img, points, device_id: int | None = None, orient=True):
         '''
         img_height, img_width = img.shape[0:2]
         left = int(np.min(points[:, 0]))
@@ -577,42 +705,106 @@ class OCR:
             max(
                 np.linalg.norm(points[0] - points[3]),
                 np.linalg.norm(points[1] - points[2])))
-        pts_std = np.float32([[0, 0], [img_crop_width, 0],
-                              [img_crop_width, img_crop_height],
-                              [0, img_crop_height]])
-        M = cv2.getPerspectiveTransform(points, pts_std)
-        dst_img = cv2.warpPerspective(
-            img,
-            M, (img_crop_width, img_crop_height),
-            borderMode=cv2.BORDER_REPLICATE,
-            flags=cv2.INTER_CUBIC)
-        dst_img_height, dst_img_width = dst_img.shape[0:2]
-        if dst_img_height * 1.0 / dst_img_width >= 1.5:
-            # Try original orientation
-            rec_result = self.text_recognizer[0]([dst_img])
-            text, score = rec_result[0][0]
-            best_score = score
-            best_img = dst_img
-
-            # Try clockwise 90° rotation
-            rotated_cw = np.rot90(dst_img, k=3)
-            rec_result = self.text_recognizer[0]([rotated_cw])
-            rotated_cw_text, rotated_cw_score = rec_result[0][0]
-            if rotated_cw_score > best_score:
-                best_score = rotated_cw_score
-                best_img = rotated_cw
-
-            # Try counter-clockwise 90° rotation
-            rotated_ccw = np.rot90(dst_img, k=1)
-            rec_result = self.text_recognizer[0]([rotated_ccw])
-            rotated_ccw_text, rotated_ccw_score = rec_result[0][0]
-            if rotated_ccw_score > best_score:
-                best_img = rotated_ccw
-
-            # Use the best image
-            dst_img = best_img
+        dst_img = self.axis_aligned_crop(img, points, img_crop_width, img_crop_height)
+        if dst_img is None:
+            pts_std = np.float32([[0, 0], [img_crop_width, 0],
+                                  [img_crop_width, img_crop_height],
+                                  [0, img_crop_height]])
+            M = cv2.getPerspectiveTransform(points, pts_std)
+            dst_img = cv2.warpPerspective(
+                img,
+                M, (img_crop_width, img_crop_height),
+                borderMode=cv2.BORDER_REPLICATE,
+                flags=cv2.INTER_CUBIC)
+        if orient and self.is_tall(dst_img):
+            # Use the best orientation
+            candidates = self.orientation_candidates(dst_img)
+            rec_res, _ = self.text_recognizer[device_id or 0](candidates)
+            dst_img = candidates[self.best_orientation(rec_res)]
         return dst_img
 
+    @staticmethod
+    def is_tall(img):
+        """Whether the text of a crop may run vertically, to be tried rotated."""
+        return img.shape[0] * 1.0 / img.shape[1] >= 1.5
+
+    @staticmethod
+    def orientation_candidates(img):
+        """The original crop, its clockwise and its counter-clockwise 90° rotation."""
+        return [img, np.rot90(img, k=3), np.rot90(img, k=1)]
+
+    @staticmethod
+    def best_orientation(rec_res):
+        """Index of the best scored of the (text, score) results, the first one on ties."""
+        best = 0
+        for i in range(1, len(rec_res)):
+            if rec_res[i][1] > rec_res[best][1]:
+                best = i
+        return best
+
+    def page_orientation(self, img, dt_boxes, device_id: int | None = None, sample=8, min_share=0.8):
+        """
+        Rotation of a page image, as the `k` of np.rot90, which turns its text upright,
+        from a vote of its `sample` largest text boxes: every one of them is recognized
+        in the four orientations and votes for its best scored one. None when less than
+        `min_share` of them agree.
+        """
+        if device_id is None:
+            device_id = 0
+        crops = []
+        for box in sorted(dt_boxes, key=lambda b: -np.prod(np.ptp(b, axis=0)))[:sample]:
+            left, top = np.maximum(np.min(box, axis=0), 0).astype(int)
+            right, bottom = np.max(box, axis=0).astype(int)
+            if right - left > 1 and bottom - top > 1:
+                crops.append(img[top:bottom, left:right])
+        if not crops:
+            return None
+        rec_res, _ = self.text_recognizer[device_id]([np.rot90(c, k) for c in crops for k in range(4)])
+        votes = np.bincount([self.best_orientation(rec_res[i:i + 4]) for i in range(0, len(rec_res), 4)],
+                            minlength=4)
+        k = int(np.argmax(votes))
+        if votes[k] < min_share * len(crops):
+            return None
+        return k
+
+    @staticmethod
+    def unrotate_box(box, k, shape):
+        """
+        The box `box`, found on np.rot90(img, k) of an image of `shape`, on the image
+        itself: its bounding rectangle, clockwise from the top left corner.
+        """
+        h, w = shape[:2]
+        x, y = np.array(box, dtype=np.float32).T
+        for i in reversed(range(k % 4)):
+            # the i-th counter-clockwise turn maps (x, y) to (y, width - x), width being
+            # the one of the image it turned, undone from the last turn to the first
+            x, y = (w if i % 2 == 0 else h) - y, x
+        x0, x1, y0, y1 = x.min(), x.max(), y.min(), y.max()
+        return np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+
+    def recognize_oriented(self, img_list, device_id: int | None = None, orient=None):
+        """
+        Recognize `img_list` in one batched call on `device_id`, trying the tall
+        crops in all their orientations alongside the others and keeping, for each,
+        the result of the best scored one.
+        orient: flags of the crops whose orientation is tried, all of them by default.
+        Returns the (text, score) pairs of the crops and the elapsed time.
+        """
+        if device_id is None:
+            device_id = 0
+        if orient is None:
+            orient = [True] * len(img_list)
+        candidates, spans = [], []
+        for img, o in zip(img_list, orient):
+            cands = self.orientation_candidates(img) if o and self.is_tall(img) else [img]
+            spans.append((len(candidates), len(candidates) + len(cands)))
+            candidates.extend(cands)
+        rec_res, elapse = self.text_recognizer[device_id](candidates)
+        best = []
+        for beg, end in spans:
+            best.append(rec_res[beg + self.best_orientation(rec_res[beg:end])])
+        return best, elapse
+
     def sorted_boxes(self, dt_boxes):
         """
         Sort text boxes in order from top to bottom, left to right
@@ -661,18 +853,23 @@ class OCR:
         if device_id is None:
             device_id = 0
 
-        img_crop = self.get_rotate_crop_image(ori_im, box)
+        img_crop = self.get_rotate_crop_image(ori_im, box, orient=False)
 
-        rec_res, elapse = self.text_recognizer[device_id]([img_crop])
+        rec_res, elapse = self.recognize_oriented([img_crop], device_id)
         text, score = rec_res[0]
         if score < self.drop_score:
             return ""
         return text
 
-    def recognize_batch(self, img_list, device_id: int | None = None):
+    def recognize_batch(self, img_list, device_id: int | None = None, orient=None):
+        """
+        Texts of the crops, tall ones being recognized in their best orientation,
+        so they can be cropped with `orient=False`.
+        orient: see `recognize_oriented`.
+        """
         if device_id is None:
             device_id = 0
-        rec_res, elapse = self.text_recognizer[device_id](img_list)
+        rec_res, elapse = self.recognize_oriented(img_list, device_id, orient)
         texts = []
         for i in range(len(rec_res)):
             text, score = rec_res[i]
@@ -705,10 +902,10 @@ class OCR:
 
         for bno in range(len(dt_boxes)):
             tmp_box = copy.deepcopy(dt_boxes[bno])
-            img_crop = self.get_rotate_crop_image(ori_im, tmp_box)
+            img_crop = self.get_rotate_crop_image(ori_im, tmp_box, orient=False)
             img_crop_list.append(img_crop)
 
-        rec_res, elapse = self.text_recognizer[device_id](img_crop_list)
+        rec_res, elapse = self.recognize_oriented(img_crop_list, device_id)
 
         time_dict['rec'] = elapse
 
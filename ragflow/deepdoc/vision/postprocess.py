@@ -23,7 +23,8 @@ import pyclipper
 
 
 def build_post_process(config, global_config=None):
-    support_dict = {'DBPostProcess': DBPostProcess, 'CTCLabelDecode': CTCLabelDecode}
+    support_dict = {'DBPostProcess': DBPostProcess, 'FastDBPostProcess': FastDBPostProcess,
+                    'CTCLabelDecode': CTCLabelDecode}
 
     config = copy.deepcopy(config)
     module_name = config.pop('name')
@@ -259,6 +260,80 @@ class DBPostProcess:
         return boxes_batch
 
 
+class FastDBPostProcess(DBPostProcess):
+    """
+    DBPostProcess with the per contour work batched: the mini boxes are ordered,
+    size filtered and scaled as arrays, and the mean scores of the axis-aligned
+    boxes, nearly all of them on document pages, are read off an integral image
+    of the probability map. Gives the same boxes as DBPostProcess.
+    """
+
+    @staticmethod
+    def mini_boxes(rects):
+        """`get_mini_boxes` of many cv2.minAreaRect results: (N, 4, 2) points and the short sides."""
+        pts = np.array([cv2.boxPoints(r) for r in rects], dtype=np.float32).reshape(-1, 4, 2)
+        sides = np.array([min(r[1]) for r in rects], dtype=np.float32)
+        pts = np.take_along_axis(pts, np.argsort(pts[:, :, 0], axis=1, kind="stable")[:, :, None], axis=1)
+        # of the two leftmost points the upper one comes first, of the two rightmost ones the upper one second
+        i1 = np.where(pts[:, 1, 1] > pts[:, 0, 1], 0, 1)
+        i2 = np.where(pts[:, 3, 1] > pts[:, 2, 1], 2, 3)
+        order = np.stack([i1, i2, 5 - i2, 1 - i1], axis=1)
+        return np.take_along_axis(pts, order[:, :, None], axis=1), sides
+
+    def boxes_score_fast(self, bitmap, boxes):
+        """`box_score_fast` of every box of `boxes` (N, 4, 2)."""
+        h, w = bitmap.shape[:2]
+        xmin = np.clip(np.floor(boxes[:, :, 0].min(axis=1)).astype("int32"), 0, w - 1)
+        xmax = np.clip(np.ceil(boxes[:, :, 0].max(axis=1)).astype("int32"), 0, w - 1)
+        ymin = np.clip(np.floor(boxes[:, :, 1].min(axis=1)).astype("int32"), 0, h - 1)
+        ymax = np.clip(np.ceil(boxes[:, :, 1].max(axis=1)).astype("int32"), 0, h - 1)
+        # the polygon box_score_fast fills, in the coordinates of its mask
+        poly = (boxes - np.stack([xmin, ymin], axis=1)[:, None, :]).astype("int32")
+        rect = (poly[:, 0, 1] == poly[:, 1, 1]) & (poly[:, 2, 1] == poly[:, 3, 1]) \
+            & (poly[:, 0, 0] == poly[:, 3, 0]) & (poly[:, 1, 0] == poly[:, 2, 0])
+        x0 = xmin + np.clip(poly[:, :, 0].min(axis=1), 0, xmax - xmin)
+        x1 = xmin + np.clip(poly[:, :, 0].max(axis=1), 0, xmax - xmin)
+        y0 = ymin + np.clip(poly[:, :, 1].min(axis=1), 0, ymax - ymin)
+        y1 = ymin + np.clip(poly[:, :, 1].max(axis=1), 0, ymax - ymin)
+        integral = cv2.integral(bitmap, sdepth=cv2.CV_64F)
+        sums = integral[y1 + 1, x1 + 1] - integral[y0, x1 + 1] - integral[y1 + 1, x0] + integral[y0, x0]
+        scores = sums / ((x1 - x0 + 1) * (y1 - y0 + 1))
+        # rotated boxes are filled as polygons, one by one
+        for i in np.flatnonzero(~rect):
+            scores[i] = self.box_score_fast(bitmap, boxes[i])
+        return scores
+
+    def boxes_from_bitmap(self, pred, _bitmap, dest_width, dest_height):
+        if self.score_mode != "fast":
+            return super().boxes_from_bitmap(pred, _bitmap, dest_width, dest_height)
+        bitmap = _bitmap
+        height, width = bitmap.shape
+
+        outs = cv2.findContours((bitmap * 255).astype(np.uint8), cv2.RETR_LIST,
+                                cv2.CHAIN_APPROX_SIMPLE)
+        contours = outs[-2]
+
+        points, sside = self.mini_boxes([cv2.minAreaRect(c) for c in contours[:self.max_candidates]])
+        points = points[sside >= self.min_size]
+        scores = self.boxes_score_fast(pred, points)
+        keep = scores >= self.box_thresh
+        points, scores = points[keep], scores[keep]
+
+        # offsetting goes through pyclipper polygon by polygon
+        boxes, sside = self.mini_boxes([cv2.minAreaRect(self.unclip(p, self.unclip_ratio).reshape(-1, 1, 2))
+                                        for p in points])
+        keep = sside >= self.min_size + 2
+        boxes, scores = boxes[keep], scores[keep]
+        if not len(boxes):
+            return np.array([], dtype="int32"), []
+
+        boxes[:, :, 0] = np.clip(
+            np.round(boxes[:, :, 0] / width * dest_width), 0, dest_width)
+        boxes[:, :, 1] = np.clip(
+            np.round(boxes[:, :, 1] / height * dest_height), 0, dest_height)
+        return boxes.astype("int32"), scores.tolist()
+
+
 class BaseRecLabelDecode:
     """ Convert between text-label and text-index """
 
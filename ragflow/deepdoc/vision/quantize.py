@@ -0,0 +1,160 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+"""
+Make the int8 variants of the DeepDoc models, next to the fp32 ones, which
+`load_model` loads for models whose SessionSettings has precision="int8".
+
+Dynamic quantization only needs the models. Static quantization also needs
+calibration pages, rendered from the PDFs given, and is usually the faster
+and the more accurate one for these convolutional models.
+
+Needs the `onnx` package on top of onnxruntime.
+
+Usage:
+    python -m ragflow.deepdoc.vision.quantize --models det,rec,layout,tsr --mode dynamic
+    python -m ragflow.deepdoc.vision.quantize --mode static --calibration a.pdf b.pdf --pages 16
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+
+import numpy as np
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from ragflow.api.utils.file_utils import get_project_base_directory
+from ragflow.deepdoc.vision.session_settings import MODELS, SessionSettings
+
+QUANTIZATION_MODES = ["dynamic", "static"]
+MODEL_DIR = os.path.join(get_project_base_directory(), "rag/res/deepdoc")
+
+
+class FeedsReader(CalibrationDataReader):
+    """Hands the precomputed input feeds of a model over to the calibrator."""
+
+    def __init__(self, feeds):
+        self.feeds = iter(feeds)
+
+    def get_next(self):
+        return next(self.feeds, None)
+
+
+def calibration_images(pdfs, pages=16, zoomin=3):
+    """Page images (RGB arrays) of the first `pages` pages of the PDFs, in all."""
+    from ragflow.deepdoc.parser.rasterizer import as_array, get_rasterizer
+
+    images = []
+    for pdf in pdfs:
+        with get_rasterizer("pdfplumber", pdf) as r:
+            for i in range(min(len(r), pages - len(images))):
+                images.append(as_array(r.render(i, zoomin)))
+        if len(images) >= pages:
+            break
+    return images
+
+
+def crop(img, box):
+    """The bounding rectangle of a detected box, straight crops are good enough for calibration."""
+    box = np.array(box)
+    left, top = np.maximum(box.min(axis=0).astype(int), 0)
+    right, bottom = box.max(axis=0).astype(int)
+    return img[top:bottom, left:right]
+
+
+def calibration_feeds(nm, images):
+    """Input feeds of the fp32 model `nm`, preprocessed from the page images as a parse does it."""
+    from ragflow.deepdoc.vision.ocr import TextDetector, TextRecognizer, transform
+
+    if nm == "det":
+        det = TextDetector(MODEL_DIR)
+        feeds = []
+        for img in images:
+            data = transform({"image": img}, det.preprocess_op)
+            if data is not None:
+                feeds.append({det.input_tensor.name: np.expand_dims(data[0], axis=0).copy()})
+        return feeds
+
+    if nm == "rec":
+        # text line crops, as found by the fp32 detector
+        det, rec = TextDetector(MODEL_DIR), TextRecognizer(MODEL_DIR)
+        feeds = []
+        for img in images:
+            boxes, _ = det(img)
+            crops = [crop(img, b) for b in (boxes if boxes is not None else [])]
+            crops = [c for c in crops if c.shape[0] > 1 and c.shape[1] > 1]
+            _, imgH, imgW = rec.rec_image_shape[:3]
+            for beg in range(0, len(crops), rec.rec_batch_num):
+                batch = crops[beg:beg + rec.rec_batch_num]
+                ratio = max([imgW / imgH] + [c.shape[1] / c.shape[0] for c in batch])
+                feeds.append({rec.input_tensor.name: np.concatenate(
+                    [rec.resize_norm_img(c, ratio)[np.newaxis, :] for c in batch])})
+        return feeds
+
+    from ragflow.deepdoc.vision import LayoutRecognizer, TableStructureRecognizer
+
+    recognizer = LayoutRecognizer("layout") if nm == "layout" else TableStructureRecognizer()
+    if nm == "tsr":
+        # tsr sees table crops, the page images are the closest thing there is without a layout pass
+        images = [img[img.shape[0] // 4: img.shape[0] * 3 // 4] for img in images]
+    return [{k: v for k, v in ins.items() if k in recognizer.input_names} for ins in recognizer.preprocess(images)]
+
+
+def quantize(nm, mode="dynamic", images=None, per_channel=False):
+    """
+    Write the int8 variant of the model `nm` ("det", "rec", "layout" or "tsr") and return its path.
+    images: calibration page images, needed by static quantization.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}, should be one of {QUANTIZATION_MODES}")
+    src = os.path.join(MODEL_DIR, SessionSettings().model_file_name(nm))
+    dst = os.path.join(MODEL_DIR, SessionSettings(precision="int8").model_file_name(nm))
+    with tempfile.TemporaryDirectory(dir=MODEL_DIR) as tmp_dir:
+        tmp = os.path.join(tmp_dir, os.path.basename(dst))
+        if mode == "dynamic":
+            quantize_dynamic(src, tmp, per_channel=per_channel, weight_type=QuantType.QUInt8)
+        else:
+            if not images:
+                raise ValueError("static quantization needs calibration images")
+            pre = os.path.join(tmp_dir, "pre.onnx")
+            quant_pre_process(src, pre)
+            quantize_static(pre, tmp, FeedsReader(calibration_feeds(nm, images)),
+                            quant_format=QuantFormat.QDQ, per_channel=per_channel,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        os.replace(tmp, dst)
+    logging.info(f"quantize {src} -> {dst} ({mode})")
+    return dst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", default=",".join(MODELS))
+    parser.add_argument("--mode", choices=QUANTIZATION_MODES, default="dynamic")
+    parser.add_argument("--per-channel", action="store_true")
+    parser.add_argument("--calibration", nargs="*", default=[], help="PDFs the calibration pages are taken from")
+    parser.add_argument("--pages", type=int, default=16, help="number of calibration pages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    images = calibration_images(args.calibration, args.pages) if args.mode == "static" else None
+    for nm in args.models.split(","):
+        print(quantize(nm, args.mode, images, args.per_channel))
+
+
+if __name__ == "__main__":
+    main()
@@ -27,9 +27,10 @@ from .operators import *  # noqa: F403
 from .operators import preprocess
 from . import operators
 from .ocr import load_model
+from .session_settings import SessionSettings
 
 class Recognizer:
-    def __init__(self, label_list, task_name, model_dir=None):
+    def __init__(self, label_list, task_name, model_dir=None, settings: SessionSettings | None = None):
         """
         If you have trouble downloading HuggingFace models, -_^ this might help!!
 
@@ -40,16 +41,19 @@ class Recognizer:
         Good luck
         ^_-
 
+        settings: session settings of the model.
         """
         if not model_dir:
             model_dir = os.path.join(
                         get_project_base_directory(),
                         "rag/res/deepdoc")
-        self.ort_sess, self.run_options = load_model(model_dir, task_name)
+        self.ort_sess, self.run_options = load_model(model_dir, task_name, settings=settings)
         self.input_names = [node.name for node in self.ort_sess.get_inputs()]
         self.output_names = [node.name for node in self.ort_sess.get_outputs()]
         self.input_shape = self.ort_sess.get_inputs()[0].shape[2:4]
         self.label_list = label_list
+        # a symbolic batch dimension means several images can go through one run
+        self.batch_inference = not isinstance(self.ort_sess.get_inputs()[0].shape[0], int)
 
     @staticmethod
     def sort_Y_firstly(arr, threashold):
@@ -280,6 +284,14 @@ class Recognizer:
 
         return max_overlapped_i
 
+    def input_side(self):
+        """The longer side of the images the model is fed with, None if it isn't fixed."""
+        if "scale_factor" in self.input_names:
+            return 800
+        if all(isinstance(s, int) and s > 0 for s in self.input_shape):
+            return max(self.input_shape)
+        return None
+
     def preprocess(self, image_list):
         inputs = []
         if "scale_factor" in self.input_names:
@@ -406,25 +418,46 @@ class Recognizer:
             "score": float(scores[i])
         } for i in indices]
 
-    def __call__(self, image_list, thr=0.7, batch_size=16):
+    def run_batch(self, inputs, thr):
+        """
+        Run the preprocessed inputs of one batch. Same-shape single-tensor inputs
+        are stacked into one tensor and the outputs are split per image; models
+        exported with a fixed batch size or extra inputs run one image at a time.
+        """
+        name = self.input_names[0]
+        if self.batch_inference and len(inputs) > 1 and len(self.input_names) == 1 \
+                and len(set(ins[name].shape for ins in inputs)) == 1:
+            try:
+                outputs = self.ort_sess.run(None, {name: np.concatenate([ins[name] for ins in inputs], axis=0)},
+                                            self.run_options)[0]
+                if len(outputs) == len(inputs):
+                    return [self.postprocess(outputs[i:i + 1], ins, thr) for i, ins in enumerate(inputs)]
+                logging.warning(f"{self.__class__.__name__} returned {len(outputs)} results for a batch of {len(inputs)}")
+            except Exception:
+                logging.exception(f"{self.__class__.__name__} batched inference")
+            logging.warning(f"{self.__class__.__name__} falls back to one image per run")
+            self.batch_inference = False
+
         res = []
-        imgs = []
-        for i in range(len(image_list)):
-            if not isinstance(image_list[i], np.ndarray):
-                imgs.append(np.array(image_list[i]))
-            else:
-                imgs.append(image_list[i])
+        for ins in inputs:
+            bb = self.postprocess(self.ort_sess.run(None, {k:v for k,v in ins.items() if k in self.input_names}, self.run_options)[0], ins, thr)
+            res.append(bb)
+        return res
 
-        batch_loop_cnt = math.ceil(float(len(imgs)) / batch_size)
+    def __call__(self, image_list, thr=0.7, batch_size=16):
+        res = []
+        # convert images batch by batch, so that only one batch of arrays is alive at a time
+        batch_loop_cnt = math.ceil(float(len(image_list)) / batch_size)
         for i in range(batch_loop_cnt):
             start_index = i * batch_size
-            end_index = min((i + 1) * batch_size, len(imgs))
-            batch_image_list = imgs[start_index:end_index]
+            end_index = min((i + 1) * batch_size, len(image_list))
+            batch_image_list = []
+            for j in range(start_index, end_index):
+                img = image_list[j]
+                batch_image_list.append(img if isinstance(img, np.ndarray) else np.array(img))
             inputs = self.preprocess(batch_image_list)
             logging.debug("preprocess")
-            for ins in inputs:
-                bb = self.postprocess(self.ort_sess.run(None, {k:v for k,v in ins.items() if k in self.input_names}, self.run_options)[0], ins, thr)
-                res.append(bb)
+            res.extend(self.run_batch(inputs, thr))
 
         #seeit.save_results(image_list, res, self.label_list, threshold=thr)
 
@@ -0,0 +1,149 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import os
+from dataclasses import dataclass, field, replace
+
+import onnxruntime as ort
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+# model file suffixes of the variants, the int8 ones are made by `python -m ragflow.deepdoc.vision.quantize`
+PRECISIONS = {
+    "fp32": "",
+    "int8": ".int8",
+}
+
+MODELS = ("det", "rec", "layout", "tsr")
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+@dataclass(frozen=True)
+class SessionSettings:
+    """
+    ONNX Runtime session options of one model. The defaults are what every
+    session used to be created with.
+    """
+    intra_op_num_threads: int = 2
+    inter_op_num_threads: int = 2
+    execution_mode: str = "sequential"
+    graph_optimization_level: str = "all"
+    enable_cpu_mem_arena: bool = False
+    # save the optimized graph next to the model on first load, and load it from there afterwards
+    cache_optimized_model: bool = True
+    # which variant of the model file is loaded, one of PRECISIONS
+    precision: str = "fp32"
+    # text recognition only: cap of a batch's padded input area, in pixels per channel, with
+    # crops batched by width, see `TextRecognizer.batch_bounds`. 0 for fixed batches of 16 crops
+    max_batch_pixels: int = 0
+
+    def __post_init__(self):
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {self.execution_mode}, "
+                             f"should be one of {list(EXECUTION_MODES.keys())}")
+        if self.graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {self.graph_optimization_level}, "
+                             f"should be one of {list(GRAPH_OPTIMIZATION_LEVELS.keys())}")
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {self.precision}, should be one of {list(PRECISIONS.keys())}")
+        if self.max_batch_pixels < 0:
+            raise ValueError(f"max_batch_pixels should not be negative: {self.max_batch_pixels}")
+
+    def model_file_name(self, nm):
+        return nm + PRECISIONS[self.precision] + ".onnx"
+
+    def session_options(self):
+        options = ort.SessionOptions()
+        options.enable_cpu_mem_arena = self.enable_cpu_mem_arena
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization_level]
+        options.intra_op_num_threads = self.intra_op_num_threads
+        options.inter_op_num_threads = self.inter_op_num_threads
+        return options
+
+    def serialized_optimization_level(self):
+        """
+        The level of the optimized graph that is saved: "all" adds layout
+        optimizations specific to the CPU the graph was optimized on, so they
+        are left to each session.
+        """
+        return "extended" if self.graph_optimization_level == "all" else self.graph_optimization_level
+
+    def key(self):
+        """Identifies the sessions created with these settings, see `load_model`."""
+        return (f"{self.intra_op_num_threads}-{self.inter_op_num_threads}-{self.execution_mode}-"
+                f"{self.graph_optimization_level}-{int(self.enable_cpu_mem_arena)}-{self.precision}")
+
+
+@dataclass(frozen=True)
+class OnnxSettings:
+    """Session settings of each DeepDoc model: text detection, text recognition, layout and table structure."""
+    det: SessionSettings = field(default_factory=SessionSettings)
+    rec: SessionSettings = field(default_factory=SessionSettings)
+    layout: SessionSettings = field(default_factory=SessionSettings)
+    tsr: SessionSettings = field(default_factory=SessionSettings)
+
+    @classmethod
+    def single_process(cls, threads=None):
+        """
+        One process parsing one document at a time with the whole machine: every
+        model may use all the cores, and keeps its memory arena between runs.
+        """
+        threads = threads or os.cpu_count() or 2
+        s = SessionSettings(intra_op_num_threads=threads, inter_op_num_threads=1, enable_cpu_mem_arena=True)
+        # the recognizer runs many small batches, past a few threads they only add overhead
+        return cls(det=s, rec=replace(s, intra_op_num_threads=min(threads, 4)), layout=s, tsr=s)
+
+    @classmethod
+    def many_workers(cls):
+        """
+        Many worker processes (e.g. OcrPool, or one task executor per core) sharing
+        the machine: every session sticks to a single thread so that workers don't
+        oversubscribe the cores, and frees its memory after each run.
+        """
+        s = SessionSettings(intra_op_num_threads=1, inter_op_num_threads=1)
+        return cls(det=s, rec=s, layout=s, tsr=s)
+
+    def with_precision(self, precision, models=MODELS):
+        """The same settings, with the `models` (some of "det", "rec", "layout", "tsr") loaded in `precision`."""
+        return replace(self, **{m: replace(getattr(self, m), precision=precision) for m in models})
+
+    def precisions(self):
+        """The precision of every model."""
+        return {m: getattr(self, m).precision for m in MODELS}
+
+    def result_settings(self):
+        """
+        The settings which change parse results: the precision of every model, and the
+        batching of text recognition, as the padding of a crop changes what is recognized
+        in it. Those at the values parses were made with before they were settings (all
+        fp32, fixed batches of 16) are left out, so that such parses keep their keys.
+        """
+        settings = {}
+        if set(self.precisions().values()) != {"fp32"}:
+            settings["precisions"] = self.precisions()
+        if self.rec.max_batch_pixels:
+            settings["rec_max_batch_pixels"] = self.rec.max_batch_pixels
+        return settings
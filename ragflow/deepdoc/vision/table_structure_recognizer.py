@@ -24,6 +24,7 @@ from huggingface_hub import snapshot_download
 from ragflow.api.utils.file_utils import get_project_base_directory
 from ragflow.rag.nlp import rag_tokenizer
 from .recognizer import Recognizer
+from .session_settings import OnnxSettings
 
 
 class TableStructureRecognizer(Recognizer):
@@ -36,15 +37,16 @@ class TableStructureRecognizer(Recognizer):
         "table spanning cell",
     ]
 
-    def __init__(self):
+    def __init__(self, settings: OnnxSettings | None = None):
+        settings = (settings or OnnxSettings()).tsr
         try:
             super().__init__(self.labels, "tsr", os.path.join(
                     get_project_base_directory(),
-                    "rag/res/deepdoc"))
+                    "rag/res/deepdoc"), settings)
         except Exception:
             super().__init__(self.labels, "tsr", snapshot_download(repo_id="InfiniFlow/deepdoc",
                                               local_dir=os.path.join(get_project_base_directory(), "rag/res/deepdoc"),
-                                              local_dir_use_symlinks=False))
+                                              local_dir_use_symlinks=False), settings)
 
     def __call__(self, images, thr=0.2):
         tbls = super().__call__(images, thr)
@@ -56,7 +58,9 @@ class TableStructureRecognizer(Recognizer):
                     "x0": b["bbox"][0], "x1": b["bbox"][2],
                     "top": b["bbox"][1], "bottom": b["bbox"][-1]
                     } for b in tbl]
+            # one result per table image, so results of the following tables don't shift
             if not lts:
+                res.append(lts)
                 continue
 
             left = [b["x0"] for b in lts if b["label"].find(
@@ -64,6 +68,7 @@ class TableStructureRecognizer(Recognizer):
             right = [b["x1"] for b in lts if b["label"].find(
                 "row") > 0 or b["label"].find("header") > 0]
             if not left:
+                res.append(lts)
                 continue
             left = np.mean(left) if len(left) > 4 else np.min(left)
             right = np.mean(right) if len(right) > 4 else np.max(right)
@@ -24,35 +24,36 @@ from ragflow.rag.utils import num_tokens_from_string
 from ragflow.deepdoc.parser import PdfParser, PlainParser
 
 class Pdf(PdfParser):
-    def __init__(self):
+    def __init__(self, **kwargs):
         self.model_speciess = ParserType.MANUAL.value
-        super().__init__()
+        super().__init__(**kwargs)
 
     def __call__(self, filename, binary=None, from_page=0,
-                 to_page=100000, zoomin=3, callback=None):
+                 to_page=100000, zoomin=3, callback=None, page_window=None, text_layer=False,
+                 rec_queue_size=0, raster_processes=0, rasterizer="pdfplumber", checkpoint_dir=None,
+                 ocr_snapshot=None, ocr_processes=0, pipeline_queue_size=0, layout_first=False, page_pyramid=False,
+                 page_orientation=False):
         from timeit import default_timer as timer
         start = timer()
-        callback(msg="OCR started")
-        self.__images__(
-            filename if not binary else binary,
-            zoomin,
-            from_page,
-            to_page,
-            callback
-        )
-        callback(msg="OCR finished ({:.2f}s)".format(timer() - start))
+        layouts, tables = self._ocr_stage(filename if not binary else binary, zoomin, from_page, to_page, callback,
+                                          ocr_snapshot=ocr_snapshot, pipeline_queue_size=pipeline_queue_size,
+                                          layout_first=layout_first, page_window=page_window, text_layer=text_layer,
+                                          rec_queue_size=rec_queue_size, raster_processes=raster_processes,
+                                          rasterizer=rasterizer, checkpoint_dir=checkpoint_dir,
+                                          ocr_processes=ocr_processes, page_pyramid=page_pyramid,
+                                          page_orientation=page_orientation)
         # for bb in self.boxes:
         #    for b in bb:
         #        print(b)
         logging.debug("OCR: {}".format(timer() - start))
 
         start = timer()
-        self._layouts_rec(zoomin)
+        self._layouts_rec(zoomin, layouts=layouts)
         callback(0.65, "Layout analysis ({:.2f}s)".format(timer() - start))
         logging.debug("layouts: {}".format(timer() - start))
 
         start = timer()
-        self._table_transformer_job(zoomin)
+        self._table_transformer_job(zoomin, tables=tables)
         callback(0.67, "Table analysis ({:.2f}s)".format(timer() - start))
 
         start = timer()
@@ -61,6 +62,8 @@ class Pdf(PdfParser):
         self._concat_downward()
         self._filter_forpages()
         callback(0.68, "Text merged ({:.2f}s)".format(timer() - start))
+        if self.checkpoint:
+            self.checkpoint.clear()
 
         # clean mess
         for b in self.boxes:
@@ -84,77 +87,96 @@ def chunk(filename, binary=None, from_page=0, to_page=100000,
     # is it English
     eng = lang.lower() == "english"  # pdf_parser.is_english
     if re.search(r"\.pdf$", filename, re.IGNORECASE):
-        pdf_parser = Pdf()
         if kwargs.get("layout_recognize", "DeepDOC") == "Plain Text":
             pdf_parser = PlainParser()
-        sections, tbls = pdf_parser(filename if not binary else binary,
-                                    from_page=from_page, to_page=to_page, callback=callback)
-        if sections and len(sections[0]) < 3:
-            sections = [(t, lvl, [[0] * 5]) for t, lvl in sections]
-        # set pivot using the most frequent type of title,
-        # then merge between 2 pivot
-        if len(sections) > 0 and len(pdf_parser.outlines) / len(sections) > 0.03:
-            max_lvl = max([lvl for _, lvl in pdf_parser.outlines])
-            most_level = max(0, max_lvl - 1)
-            levels = []
-            for txt, _, _ in sections:
-                for t, lvl in pdf_parser.outlines:
-                    tks = set([t[i] + t[i + 1] for i in range(len(t) - 1)])
-                    tks_ = set([txt[i] + txt[i + 1]
-                                for i in range(min(len(t), len(txt) - 1))])
-                    if len(set(tks & tks_)) / max([len(tks), len(tks_), 1]) > 0.8:
-                        levels.append(lvl)
-                        break
-                else:
-                    levels.append(max_lvl + 1)
-
         else:
-            bull = bullets_category([txt for txt, _, _ in sections])
-            most_level, levels = title_frequency(
-                bull, [(txt, lvl) for txt, lvl, _ in sections])
-
-        assert len(sections) == len(levels)
-        sec_ids = []
-        sid = 0
-        for i, lvl in enumerate(levels):
-            if lvl <= most_level and i > 0 and lvl != levels[i - 1]:
-                sid += 1
-            sec_ids.append(sid)
-            # print(lvl, self.boxes[i]["text"], most_level, sid)
-
-        sections = [(txt, sec_ids[i], poss)
-                    for i, (txt, _, poss) in enumerate(sections)]
-        for (img, rows), poss in tbls:
-            if not rows:
-                continue
-            sections.append((rows if isinstance(rows, str) else rows[0], -1,
-                            [(p[0] + 1 - from_page, p[1], p[2], p[3], p[4]) for p in poss]))
-
-        def tag(pn, left, right, top, bottom):
-            if pn + left + right + top + bottom == 0:
-                return ""
-            return "@@{}\t{:.1f}\t{:.1f}\t{:.1f}\t{:.1f}##" \
-                .format(pn, left, right, top, bottom)
-
-        chunks = []
-        last_sid = -2
-        tk_cnt = 0
-        for txt, sec_id, poss in sorted(sections, key=lambda x: (
-                x[-1][0][0], x[-1][0][3], x[-1][0][1])):
-            poss = "\t".join([tag(*pos) for pos in poss])
-            if tk_cnt < 32 or (tk_cnt < 1024 and (sec_id == last_sid or sec_id == -1)):
-                if chunks:
-                    chunks[-1] += "\n" + txt + poss
-                    tk_cnt += num_tokens_from_string(txt)
+            # reuse the caller's loaded models if any
+            pdf_parser = kwargs["pdf_parser"].fork() if kwargs.get("pdf_parser") else Pdf(onnx_settings=kwargs.get("onnx_settings"))
+        try:
+            sections, tbls = pdf_parser(filename if not binary else binary,
+                                        from_page=from_page, to_page=to_page, callback=callback,
+                                        page_window=kwargs.get("page_window"),
+                                        text_layer=kwargs.get("text_layer", False),
+                                        rec_queue_size=kwargs.get("rec_queue_size", 0),
+                                        raster_processes=kwargs.get("raster_processes", 0),
+                                        rasterizer=kwargs.get("rasterizer", "pdfplumber"),
+                                        checkpoint_dir=kwargs.get("checkpoint_dir"),
+                                        ocr_snapshot=kwargs.get("ocr_snapshot"),
+                                        ocr_processes=kwargs.get("ocr_processes", 0),
+                                        pipeline_queue_size=kwargs.get("pipeline_queue_size", 0),
+                                        layout_first=kwargs.get("layout_first", False),
+                                        page_pyramid=kwargs.get("page_pyramid", False),
+                                        page_orientation=kwargs.get("page_orientation", False))
+            if sections and len(sections[0]) < 3:
+                sections = [(t, lvl, [[0] * 5]) for t, lvl in sections]
+            # set pivot using the most frequent type of title,
+            # then merge between 2 pivot
+            if len(sections) > 0 and len(pdf_parser.outlines) / len(sections) > 0.03:
+                max_lvl = max([lvl for _, lvl in pdf_parser.outlines])
+                most_level = max(0, max_lvl - 1)
+                levels = []
+                for txt, _, _ in sections:
+                    for t, lvl in pdf_parser.outlines:
+                        tks = set([t[i] + t[i + 1] for i in range(len(t) - 1)])
+                        tks_ = set([txt[i] + txt[i + 1]
+                                    for i in range(min(len(t), len(txt) - 1))])
+                        if len(set(tks & tks_)) / max([len(tks), len(tks_), 1]) > 0.8:
+                            levels.append(lvl)
+                            break
+                    else:
+                        levels.append(max_lvl + 1)
+
+            else:
+                bull = bullets_category([txt for txt, _, _ in sections])
+                most_level, levels = title_frequency(
+                    bull, [(txt, lvl) for txt, lvl, _ in sections])
+
+            assert len(sections) == len(levels)
+            sec_ids = []
+            sid = 0
+            for i, lvl in enumerate(levels):
+                if lvl <= most_level and i > 0 and lvl != levels[i - 1]:
+                    sid += 1
+                sec_ids.append(sid)
+                # print(lvl, self.boxes[i]["text"], most_level, sid)
+
+            sections = [(txt, sec_ids[i], poss)
+                        for i, (txt, _, poss) in enumerate(sections)]
+            for (img, rows), poss in tbls:
+                if not rows:
                     continue
-            chunks.append(txt + poss)
-            tk_cnt = num_tokens_from_string(txt)
-            if sec_id > -1:
-                last_sid = sec_id
-
-        res = tokenize_table(tbls, doc, eng)
-        res.extend(tokenize_chunks(chunks, doc, eng, pdf_parser))
-        return res
+                sections.append((rows if isinstance(rows, str) else rows[0], -1,
+                                [(p[0] + 1 - from_page, p[1], p[2], p[3], p[4]) for p in poss]))
+
+            def tag(pn, left, right, top, bottom):
+                if pn + left + right + top + bottom == 0:
+                    return ""
+                return "@@{}\t{:.1f}\t{:.1f}\t{:.1f}\t{:.1f}##" \
+                    .format(pn, left, right, top, bottom)
+
+            chunks = []
+            last_sid = -2
+            tk_cnt = 0
+            for txt, sec_id, poss in sorted(sections, key=lambda x: (
+                    x[-1][0][0], x[-1][0][3], x[-1][0][1])):
+                poss = "\t".join([tag(*pos) for pos in poss])
+                if tk_cnt < 32 or (tk_cnt < 1024 and (sec_id == last_sid or sec_id == -1)):
+                    if chunks:
+                        chunks[-1] += "\n" + txt + poss
+                        tk_cnt += num_tokens_from_string(txt)
+                        continue
+                chunks.append(txt + poss)
+                tk_cnt = num_tokens_from_string(txt)
+                if sec_id > -1:
+                    last_sid = sec_id
+
+            res = tokenize_table(tbls, doc, eng)
+            res.extend(tokenize_chunks(chunks, doc, eng, pdf_parser))
+            return res
+        finally:
+            if isinstance(pdf_parser, PdfParser):
+                # done with the page images, the chunks being cropped already
+                pdf_parser.close()
     else:
         raise NotImplementedError("file type not supported yet(pdf and docx supported)")
     
@@ -0,0 +1,140 @@
+"""
+测试解析结果缓存
+"""
+
+import os
+import pytest
+
+# 设置测试环境
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from deepdoc_pdfparser.cache import ParseCache
+from deepdoc_pdfparser.parser import PdfParser
+from deepdoc_pdfparser.parse_types import ChunkResult, ParseResult
+
+
+def make_result(text: str = "hello") -> ParseResult:
+    return ParseResult(
+        chunks=[ChunkResult(content=text, page_number=0, raw_data={"docnm_kwd": "a.pdf"})],
+        tables=[],
+        metadata={"total_chunks": 1},
+    )
+
+
+class TestParseCache:
+    """测试ParseCache"""
+
+    def test_round_trip(self, tmp_path):
+        cache = ParseCache(str(tmp_path))
+        key = ParseCache.make_key(b"%PDF-1.4", from_page=0, to_page=10)
+        assert cache.get(key) is None
+        cache.put(key, make_result())
+        result = cache.get(key)
+        assert result.chunks[0].content == "hello"
+        # 写入不留下临时文件
+        assert [f for f in os.listdir(tmp_path) if f.endswith(".tmp")] == []
+
+    def test_key_depends_on_content_and_options(self):
+        key = ParseCache.make_key(b"a", from_page=0, to_page=10)
+        assert key == ParseCache.make_key(b"a", to_page=10, from_page=0)
+        assert key != ParseCache.make_key(b"b", from_page=0, to_page=10)
+        assert key != ParseCache.make_key(b"a", from_page=1, to_page=10)
+
+    def test_lru_eviction(self, tmp_path):
+        cache = ParseCache(str(tmp_path))
+        keys = [ParseCache.make_key(str(i).encode()) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, make_result("x" * 1000))
+            os.utime(cache._path(key), (i, i))
+        # 访问最旧的条目后，它变为最近使用
+        assert cache.get(keys[0]) is not None
+
+        cache.max_bytes = 2 * os.path.getsize(cache._path(keys[0]))
+        cache.evict()
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[2]) is not None
+
+    def test_corrupted_entry(self, tmp_path):
+        cache = ParseCache(str(tmp_path))
+        key = ParseCache.make_key(b"a")
+        with open(cache._path(key), "wb") as f:
+            f.write(b"not a pickle")
+        assert cache.get(key) is None
+        assert not os.path.exists(cache._path(key))
+
+
+class TestPdfParserCache:
+    """测试PdfParser使用缓存"""
+
+    def test_hit_does_not_load_models(self, tmp_path, monkeypatch):
+        calls = []
+
+        def fake_chunk(self, **kwargs):
+            calls.append(kwargs)
+            return [{"content_with_weight": "hello", "page_num_int": [1], "docnm_kwd": kwargs["filename"]}]
+
+        monkeypatch.setattr(PdfParser, "_chunk", fake_chunk)
+        parser = PdfParser(cache_dir=str(tmp_path))
+        first = parser.parse_binary(b"%PDF-1.4", filename="a.pdf")
+        assert first.metadata["from_cache"] is False
+
+        def fail(self):
+            raise AssertionError("models should not be loaded on a cache hit")
+
+        monkeypatch.setattr(PdfParser, "_init_parser", fail)
+        second = PdfParser(cache_dir=str(tmp_path)).parse_binary(b"%PDF-1.4", filename="a.pdf")
+        assert second.metadata["from_cache"] is True
+        assert second.get_text() == first.get_text()
+        assert len(calls) == 1
+
+    def test_options_change_key(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(PdfParser, "_chunk", lambda self, **kwargs: calls.append(kwargs) or [])
+        parser = PdfParser(cache_dir=str(tmp_path))
+        parser.parse_binary(b"%PDF-1.4", from_page=0, to_page=5)
+        parser.parse_binary(b"%PDF-1.4", from_page=0, to_page=5)
+        parser.parse_binary(b"%PDF-1.4", from_page=5, to_page=10)
+        assert len(calls) == 2
+
+    def test_non_result_options_share_key(self, tmp_path, monkeypatch):
+        calls = []
+        monkeypatch.setattr(PdfParser, "_chunk", lambda self, **kwargs: calls.append(kwargs) or [])
+        parser = PdfParser(cache_dir=str(tmp_path))
+        parser.parse_binary(b"%PDF-1.4", to_page=5)
+        # 只影响速度、内存或断点续传的参数不参与缓存键
+        parser.parse_binary(b"%PDF-1.4", to_page=5, checkpoint_dir=str(tmp_path / "ck"), page_window=4,
+                            ocr_snapshot=str(tmp_path / "ocr.pkl"), rec_queue_size=64, ocr_processes=2,
+                            raster_processes=2, pipeline_queue_size=8, rasterizer="pymupdf")
+        parser.parse_binary(b"%PDF-1.4", to_page=5, text_layer=True)
+        assert len(calls) == 2
+        assert calls[1]["text_layer"] is True
+
+    def test_precision_changes_key(self, tmp_path, monkeypatch):
+        from ragflow.deepdoc.vision import OnnxSettings
+
+        calls = []
+        monkeypatch.setattr(PdfParser, "_chunk", lambda self, **kwargs: calls.append(kwargs) or [])
+        parser = PdfParser(cache_dir=str(tmp_path))
+        parser.parse_binary(b"%PDF-1.4")
+        # 线程数等设置不影响结果，只有模型精度参与缓存键
+        parser.parse_binary(b"%PDF-1.4", onnx_settings=OnnxSettings.many_workers())
+        parser.parse_binary(b"%PDF-1.4", onnx_settings=OnnxSettings().with_precision("int8", ["rec"]))
+        assert len(calls) == 2
+        assert calls[1]["onnx_settings"].rec.precision == "int8"
+
+    def test_rec_batching_changes_key(self, tmp_path, monkeypatch):
+        from ragflow.deepdoc.vision import OnnxSettings, SessionSettings
+
+        calls = []
+        monkeypatch.setattr(PdfParser, "_chunk", lambda self, **kwargs: calls.append(kwargs) or [])
+        parser = PdfParser(cache_dir=str(tmp_path))
+        parser.parse_binary(b"%PDF-1.4")
+        # 默认每批固定16张，与原来的缓存键相同
+        parser.parse_binary(b"%PDF-1.4", onnx_settings=OnnxSettings())
+        parser.parse_binary(b"%PDF-1.4", onnx_settings=OnnxSettings(rec=SessionSettings(max_batch_pixels=0)))
+        # 识别分批改变裁剪图的填充，进而可能改变识别结果
+        parser.parse_binary(b"%PDF-1.4", onnx_settings=OnnxSettings(rec=SessionSettings(max_batch_pixels=1 << 20)))
+        parser.parse_binary(b"%PDF-1.4", onnx_settings=OnnxSettings(rec=SessionSettings(max_batch_pixels=1 << 21)))
+        assert len(calls) == 3
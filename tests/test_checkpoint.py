@@ -0,0 +1,56 @@
+"""
+测试分页断点续传
+"""
+
+import os
+import pytest
+
+# 设置测试环境
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ragflow.deepdoc.parser.checkpoint import PageCheckpoint, document_digest
+
+
+class TestPageCheckpoint:
+    """测试PageCheckpoint"""
+
+    def test_save_load(self, tmp_path):
+        ck = PageCheckpoint(str(tmp_path), b"%PDF-1.4", zoomin=3)
+        assert ck.load("ocr", 0) is None
+        ck.save("ocr", 0, {"boxes": [{"text": "hello"}], "mean_height": 10})
+        assert ck.load("ocr", 0) == {"boxes": [{"text": "hello"}], "mean_height": 10}
+        # 不同阶段、不同页互不影响
+        assert ck.load("layout", 0) is None
+        assert ck.load("ocr", 1) is None
+        # 写入不留下临时文件
+        assert [f for f in os.listdir(ck.dir) if f.endswith(".tmp")] == []
+
+    def test_resumed_by_same_document_and_options(self, tmp_path):
+        PageCheckpoint(str(tmp_path), b"%PDF-1.4", zoomin=3).save("ocr", 2, "page 3")
+        assert PageCheckpoint(str(tmp_path), b"%PDF-1.4", zoomin=3).load("ocr", 2) == "page 3"
+
+    def test_options_change_key(self, tmp_path):
+        PageCheckpoint(str(tmp_path), b"%PDF-1.4", zoomin=3, text_layer=False).save("ocr", 0, "page 1")
+        assert PageCheckpoint(str(tmp_path), b"%PDF-1.4", zoomin=2, text_layer=False).load("ocr", 0) is None
+        assert PageCheckpoint(str(tmp_path), b"%PDF-1.4", zoomin=3, text_layer=True).load("ocr", 0) is None
+        assert PageCheckpoint(str(tmp_path), b"%PDF-1.5", zoomin=3, text_layer=False).load("ocr", 0) is None
+
+    def test_digest_of_path_and_bytes(self, tmp_path):
+        pdf = tmp_path / "a.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        assert document_digest(str(pdf), zoomin=3) == document_digest(b"%PDF-1.4", zoomin=3)
+        assert document_digest(b"%PDF-1.4", a=1, b=2) == document_digest(b"%PDF-1.4", b=2, a=1)
+
+    def test_clear(self, tmp_path):
+        ck = PageCheckpoint(str(tmp_path), b"%PDF-1.4")
+        ck.save("ocr", 0, "page 1")
+        ck.clear()
+        assert not os.path.exists(ck.dir)
+        assert PageCheckpoint(str(tmp_path), b"%PDF-1.4").load("ocr", 0) is None
+
+    def test_corrupted_page(self, tmp_path):
+        ck = PageCheckpoint(str(tmp_path), b"%PDF-1.4")
+        with open(ck._path("ocr", 0), "wb") as f:
+            f.write(b"not a pickle")
+        assert ck.load("ocr", 0) is None
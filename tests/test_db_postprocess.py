@@ -0,0 +1,80 @@
+"""
+测试FastDBPostProcess与DBPostProcess给出相同的文本框
+"""
+
+import os
+import pytest
+
+# 设置测试环境
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import cv2
+import numpy as np
+
+from ragflow.deepdoc.vision.postprocess import DBPostProcess, FastDBPostProcess
+
+PARAMS = {"thresh": 0.3, "box_thresh": 0.5, "max_candidates": 1000, "unclip_ratio": 1.5,
+          "use_dilation": False, "score_mode": "fast", "box_type": "quad"}
+# 缩放到检测模型输入的A4页面
+SRC_H, SRC_W, H, W = 2526, 1786, 960, 704
+SHAPE = [np.array([SRC_H, SRC_W, H / SRC_H, W / SRC_W])]
+
+
+def probability_map(rng, lines, rotated=0.1):
+    """按行列排布的文本行，部分旋转，背景噪声低于阈值"""
+    pmap = np.zeros((H, W), np.float32)
+    cols = 8
+    step = max(8, (H - 16) // max(1, lines // cols))
+    for k in range(lines):
+        cy = 8 + (k // cols) * step + rng.uniform(-1, 1)
+        cx = (k % cols) * W / cols + W / cols / 2 + rng.uniform(-5, 5)
+        size = (rng.uniform(4, W / cols - 12), rng.uniform(3, max(4, step - 8)))
+        angle = rng.uniform(-30, 30) if rng.random() < rotated else 0
+        cv2.fillPoly(pmap, [cv2.boxPoints(((cx, cy), size, angle)).astype(np.int32)], float(rng.uniform(0.4, 1)))
+    pmap += rng.uniform(0, 0.25, pmap.shape).astype(np.float32)
+    return np.clip(pmap, 0, 1)[None, None]
+
+
+class TestFastDBPostProcess:
+    """测试FastDBPostProcess"""
+
+    @pytest.mark.parametrize("lines,rotated", [(40, 0.0), (200, 0.1), (800, 0.5)])
+    def test_same_boxes(self, lines, rotated):
+        loop, fast = DBPostProcess(**PARAMS), FastDBPostProcess(**PARAMS)
+        rng = np.random.default_rng(lines)
+        for _ in range(3):
+            pmap = probability_map(rng, lines, rotated)
+            ref = loop({"maps": pmap}, SHAPE)[0]["points"]
+            res = fast({"maps": pmap}, SHAPE)[0]["points"]
+            assert len(ref) > 0
+            assert np.array_equal(ref, res)
+
+    def test_same_scores(self):
+        loop, fast = DBPostProcess(**PARAMS), FastDBPostProcess(**PARAMS)
+        pmap = probability_map(np.random.default_rng(0), 200, 0.3)
+        pred, bitmap = pmap[0, 0], pmap[0, 0] > PARAMS["thresh"]
+        ref_boxes, ref_scores = loop.boxes_from_bitmap(pred, bitmap, SRC_W, SRC_H)
+        boxes, scores = fast.boxes_from_bitmap(pred, bitmap, SRC_W, SRC_H)
+        assert np.array_equal(ref_boxes, boxes)
+        assert np.allclose(ref_scores, scores, atol=1e-5)
+
+    def test_empty_map(self):
+        pmap = np.zeros((1, 1, H, W), np.float32)
+        assert len(DBPostProcess(**PARAMS)({"maps": pmap}, SHAPE)[0]["points"]) == 0
+        assert len(FastDBPostProcess(**PARAMS)({"maps": pmap}, SHAPE)[0]["points"]) == 0
+
+    def test_mini_boxes_order(self):
+        loop = DBPostProcess(**PARAMS)
+        rng = np.random.default_rng(0)
+        rects = [((rng.uniform(50, 600), rng.uniform(50, 900)), (rng.uniform(2, 80), rng.uniform(2, 80)),
+                  rng.uniform(-90, 90)) for _ in range(300)]
+        # 正放的框也要覆盖到
+        rects += [((100.5, 200.5), (40, 10), 0), ((300, 300), (10, 40), 90), ((50, 50), (20, 20), 45)]
+        contours = [cv2.boxPoints(r).astype(np.float32) for r in rects]
+        # 与boxes_from_bitmap一样，从轮廓求最小外接矩形
+        boxes, sides = FastDBPostProcess.mini_boxes([cv2.minAreaRect(c) for c in contours])
+        for contour, box, side in zip(contours, boxes, sides):
+            ref_box, ref_side = loop.get_mini_boxes(contour)
+            assert np.allclose(np.array(ref_box), box, atol=1e-3)
+            assert abs(ref_side - side) < 1e-3
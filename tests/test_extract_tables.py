@@ -0,0 +1,64 @@
+"""
+测试只提取表格的参数传递
+"""
+
+import os
+import pytest
+
+# 设置测试环境
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from deepdoc_pdfparser import utils
+from deepdoc_pdfparser.parser import PdfParser
+
+
+class FakeParser:
+    """与RAGFlowPdfParser.extract_tables参数相同的解析器"""
+
+    def __init__(self):
+        self.calls = []
+        self.closed = False
+
+    def fork(self):
+        return self
+
+    def close(self):
+        self.closed = True
+
+    def extract_tables(self, fnm, need_image=False, zoomin=3, return_html=True, page_from=0, page_to=299,
+                       callback=None, page_window=None, rasterizer="pdfplumber", layout_scale=1.0):
+        self.calls.append(dict(page_from=page_from, page_to=page_to, page_window=page_window,
+                               rasterizer=rasterizer, layout_scale=layout_scale))
+        return [((None, "<table><tr><td>1</td></tr></table>"), [(0, 10, 100, 20, 40)])]
+
+
+class TestExtractTables:
+    """测试extract_tables"""
+
+    @pytest.fixture
+    def fake(self, monkeypatch):
+        fake = FakeParser()
+        monkeypatch.setattr(PdfParser, "_get_parser", lambda self, onnx_settings=None: fake)
+        return fake
+
+    @pytest.fixture
+    def pdf(self, tmp_path):
+        path = tmp_path / "a.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        return str(path)
+
+    def test_parse_options_ignored(self, fake, pdf, monkeypatch):
+        monkeypatch.setattr(utils, "_default_parser", PdfParser())
+        # 与parse_pdf相同的调用方式
+        tables = utils.extract_tables(pdf, lang="English", parser_config={"chunk_token_num": 128}, text_layer=True)
+        assert tables == ["<table><tr><td>1</td></tr></table>"]
+        assert len(fake.calls) == 1
+        assert fake.closed
+
+    def test_table_options_passed_on(self, fake, pdf):
+        tables = PdfParser().extract_tables(pdf, from_page=1, to_page=3, lang="English",
+                                            page_window=4, rasterizer="pymupdf", layout_scale=0.5)
+        assert fake.calls == [dict(page_from=1, page_to=3, page_window=4, rasterizer="pymupdf", layout_scale=0.5)]
+        assert tables[0].page_number == 1
+        assert tables[0].position == (10, 100, 20, 40)
@@ -0,0 +1,193 @@
+"""
+测试OCR中不依赖模型的部分
+"""
+
+import os
+import pytest
+
+# 设置测试环境
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from ragflow.deepdoc.vision.ocr import OCR, TextRecognizer
+
+
+def quad(left, top, right, bottom):
+    return np.array([[left, top], [right, top], [right, bottom], [left, bottom]], dtype=np.float32)
+
+
+def warp(img, points):
+    """get_rotate_crop_image原来的裁剪方式"""
+    w = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    h = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    M = cv2.getPerspectiveTransform(points, np.float32([[0, 0], [w, 0], [w, h], [0, h]]))
+    return cv2.warpPerspective(img, M, (w, h), borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+
+
+@pytest.fixture
+def ocr():
+    # 只用到不加载模型的方法
+    return OCR.__new__(OCR)
+
+
+@pytest.fixture
+def page():
+    return np.random.default_rng(0).integers(0, 256, (300, 200, 3), dtype=np.uint8)
+
+
+class TestAxisAlignedCrop:
+    """测试正放整数像素框的切片裁剪"""
+
+    @pytest.mark.parametrize("box", [(10, 20, 110, 50), (0, 0, 200, 300), (150, 250, 200, 300), (5, 5, 6, 6)])
+    def test_same_as_warp(self, ocr, page, box):
+        points = quad(*box)
+        assert OCR.axis_aligned_crop(page, points, box[2] - box[0], box[3] - box[1]) is not None
+        assert np.array_equal(ocr.get_rotate_crop_image(page, points, orient=False), warp(page, points))
+
+    def test_integer_rectangle_after_zoom_round_trip(self, page):
+        # __ocr先除以zoomin再乘回来
+        points = quad(*[v / 3 * 3 for v in (10, 20, 110, 50)])
+        assert np.array_equal(OCR.axis_aligned_crop(page, points, 100, 30), page[20:50, 10:110])
+
+    @pytest.mark.parametrize("points", [
+        quad(10.5, 20, 110.5, 50),  # 非整数像素
+        quad(150, 250, 210, 300),  # 超出图像
+        np.array([[10, 20], [110, 25], [105, 55], [5, 50]], dtype=np.float32),  # 旋转
+        quad(10, 20, 110, 50)[[1, 2, 3, 0]],  # 不是从左上角开始
+    ])
+    def test_falls_back_to_warp(self, ocr, page, points):
+        w = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+        h = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+        assert OCR.axis_aligned_crop(page, points, w, h) is None
+        assert np.array_equal(ocr.get_rotate_crop_image(page, points, orient=False), warp(page, points))
+
+
+class FakeRecognizer:
+    """按给定的顺序返回分数的识别器"""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def __call__(self, img_list):
+        self.calls.append(img_list)
+        return [("text", s) for s in self.scores[:len(img_list)]], 0.
+
+
+def votes(ks):
+    """每个框在四个方向上的分数，第i个框在ks[i]方向上最高"""
+    return [0.9 if k == best else 0.1 for best in ks for k in range(4)]
+
+
+class TestPageOrientation:
+    """测试整页方向投票"""
+
+    boxes = [quad(10, 10 + 40 * i, 110 - 10 * i, 30 + 40 * i) for i in range(5)]
+
+    @pytest.mark.parametrize("ks,expected", [
+        ([1, 1, 1, 1, 1], 1),
+        ([2, 2, 2, 2, 0], 2),  # 恰好80%
+        ([3, 3, 3, 0, 0], None),  # 不到80%
+        ([0, 0, 0, 0, 0], 0),
+    ])
+    def test_vote_threshold(self, ocr, page, ks, expected):
+        ocr.text_recognizer = [FakeRecognizer(votes(ks))]
+        assert ocr.page_orientation(page, self.boxes) == expected
+        # 所有方向在一次调用里识别
+        assert len(ocr.text_recognizer[0].calls) == 1
+        assert len(ocr.text_recognizer[0].calls[0]) == 4 * len(self.boxes)
+
+    def test_samples_largest_boxes(self, ocr, page):
+        ocr.text_recognizer = [FakeRecognizer(votes([1, 1]))]
+        assert ocr.page_orientation(page, self.boxes[::-1], sample=2) == 1
+        first = ocr.text_recognizer[0].calls[0][0]
+        assert first.shape[:2] == (20, 100)
+
+    def test_no_boxes(self, ocr, page):
+        ocr.text_recognizer = [FakeRecognizer([])]
+        assert ocr.page_orientation(page, [quad(5, 5, 6, 6)]) is None
+        assert ocr.text_recognizer[0].calls == []
+
+
+class TestUnrotateBox:
+    """测试把旋转后页面上的框映射回原页面"""
+
+    @pytest.mark.parametrize("k", [0, 1, 2, 3])
+    def test_maps_back_pixels(self, page, k):
+        box = quad(10, 20, 110, 50)
+        turned = np.rot90(page, k)
+        # 原页面上的框在旋转后页面上的位置
+        mask = np.zeros(page.shape[:2], dtype=bool)
+        mask[20:50, 10:110] = True
+        ys, xs = np.nonzero(np.rot90(mask, k))
+        on_turned = quad(xs.min(), ys.min(), xs.max() + 1, ys.max() + 1)
+        assert np.array_equal(OCR.unrotate_box(on_turned, k, page.shape), box)
+        top, left = int(on_turned[0][1]), int(on_turned[0][0])
+        bottom, right = int(on_turned[2][1]), int(on_turned[2][0])
+        assert np.array_equal(np.rot90(turned[top:bottom, left:right], -k), page[20:50, 10:110])
+
+    def test_clockwise_from_top_left(self, page):
+        box = OCR.unrotate_box(np.array([[5, 5], [25, 5], [25, 10], [5, 10]]), 1, page.shape)
+        (x0, y0), (x1, _), (_, y1), _ = box
+        assert x0 < x1 and y0 < y1
+        assert np.array_equal(box, quad(x0, y0, x1, y1))
+
+
+def recognizer(max_batch_pixels, input_width=None):
+    """只用于分批的识别器，输入宽度为None时按批动态填充"""
+    rec = TextRecognizer.__new__(TextRecognizer)
+    rec.rec_image_shape = [3, 48, 320]
+    rec.rec_batch_num = 16
+    rec.max_batch_pixels = max_batch_pixels
+    rec.input_tensor = SimpleNamespace(shape=[None, 3, 48, input_width])
+    return rec
+
+
+class TestBatchBounds:
+    """测试按宽度和像素预算分批"""
+
+    def test_fixed_batches_without_budget(self):
+        rec = recognizer(0)
+        assert rec.batch_bounds([1.0] * 40) == [(0, 16), (16, 32), (32, 40)]
+        assert rec.batch_bounds([1.0, 50.0]) == [(0, 2)]
+        assert rec.batch_bounds([]) == []
+
+    def test_short_crops_share_a_batch(self):
+        # 都填充到最小宽度320
+        rec = recognizer(16 * 48 * 640)
+        assert rec.batch_bounds([2.0] * 40) == [(0, 32), (32, 40)]
+
+    def test_long_crop_not_batched_with_short_ones(self):
+        rec = recognizer(16 * 48 * 640)
+        assert rec.batch_bounds([2.0] * 15 + [30.0]) == [(0, 15), (15, 16)]
+
+    def test_width_bucket(self):
+        rec = recognizer(1 << 30)
+        # 填充宽度 480, 960, 961
+        assert rec.batch_bounds([10.0, 20.0, 20.03]) == [(0, 2), (2, 3)]
+
+    def test_oversized_crop_gets_its_own_batch(self):
+        rec = recognizer(48 * 320)
+        assert rec.batch_bounds([100.0]) == [(0, 1)]
+        assert rec.batch_bounds([1.0, 100.0, 100.0]) == [(0, 1), (1, 2), (2, 3)]
+
+    def test_budget_caps_padded_area(self):
+        rec = recognizer(16 * 48 * 640)
+        ratios = sorted(np.random.default_rng(0).uniform(1, 40, 200))
+        bounds = rec.batch_bounds(ratios)
+        assert bounds[0][0] == 0 and bounds[-1][1] == len(ratios)
+        assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+        for beg, end in bounds:
+            width = rec.padded_width(max(320 / 48, *ratios[beg:end]))
+            assert end - beg == 1 or (end - beg) * 48 * width <= rec.max_batch_pixels
+            assert width <= 2 * rec.padded_width(max(320 / 48, ratios[beg]))
+
+    def test_fixed_input_width(self):
+        rec = recognizer(16 * 48 * 320, input_width=320)
+        assert rec.padded_width(30.0) == 320
+        assert rec.batch_bounds([1.0, 30.0] * 10) == [(0, 16), (16, 20)]
@@ -0,0 +1,47 @@
+"""
+测试TableStructureRecognizer的后处理
+"""
+
+import os
+import pytest
+
+# 设置测试环境
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ragflow.deepdoc.vision.recognizer import Recognizer
+from ragflow.deepdoc.vision.table_structure_recognizer import TableStructureRecognizer
+
+
+def component(label, x0, top, x1, bottom):
+    return {"type": label, "score": 0.9, "bbox": [x0, top, x1, bottom]}
+
+
+class TestTableStructureRecognizer:
+    """测试每张表格图像对应一个结果"""
+
+    @pytest.fixture
+    def tsr(self, monkeypatch):
+        tables = [
+            [component("table row", 10, 0, 90, 10), component("table row", 5, 10, 95, 20)],
+            [],  # 没有识别出结构
+            [component("table column", 0, 5, 50, 100)],  # 没有行
+            [component("table column", 0, 2, 50, 100), component("table column", 50, 0, 100, 98),
+             component("table row", 0, 0, 100, 10)],
+        ]
+        monkeypatch.setattr(Recognizer, "__call__", lambda self, images, thr=0.2: tables[:len(images)])
+        return TableStructureRecognizer.__new__(TableStructureRecognizer)
+
+    def test_one_result_per_table(self, tsr):
+        res = tsr([None] * 4)
+        assert len(res) == 4
+        assert res[1] == []
+        assert [b["label"] for b in res[2]] == ["table column"]
+        # 后面表格的结果没有错位到前面的表格上
+        assert [b["label"] for b in res[3]] == ["table column", "table column", "table row"]
+
+    def test_aligns_rows_and_columns(self, tsr):
+        rows = tsr([None])[0]
+        assert [(b["x0"], b["x1"]) for b in rows] == [(5, 95), (5, 95)]
+        columns = tsr([None] * 4)[3][:2]
+        assert [(b["top"], b["bottom"]) for b in columns] == [(0, 100), (0, 100)]